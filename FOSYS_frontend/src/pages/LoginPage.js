@@ -120,6 +120,11 @@ const LoginPage = () => {
 
       // Save backend user object locally
       localStorage.setItem("fosys_user", JSON.stringify(user));
+      // Session tokens (sent as Bearer by utils/api.js)
+      if (response?.data?.token) {
+        localStorage.setItem("token", response.data.token);
+        localStorage.setItem("refresh_token", response.data.refresh_token);
+      }
       toast.success(`Welcome back, ${user.name || user.email}!`);
 
 
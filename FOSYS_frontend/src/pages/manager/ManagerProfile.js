@@ -9,6 +9,7 @@ import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from '@
 import { Switch } from '@/components/ui/switch';
 import { Avatar, AvatarFallback, AvatarImage } from '@/components/ui/avatar';
 import { toast } from 'sonner';
+import { logout } from '@/utils/api';
 
 const ManagerProfile = ({ user, setUser }) => {
   const navigate = useNavigate();
@@ -32,8 +33,8 @@ const ManagerProfile = ({ user, setUser }) => {
     toast.success('Profile updated successfully!');
   };
 
-  const handleLogout = () => {
-    localStorage.removeItem('fosys_user');
+  const handleLogout = async () => {
+    await logout();
     toast.success('Logged out successfully');
     navigate('/login');
   };
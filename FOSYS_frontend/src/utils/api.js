@@ -20,5 +20,70 @@ api.interceptors.request.use(
     (error) => Promise.reject(error)
 );
 
+// ✅ On 401, swap the refresh token for a new pair once and retry the request.
+// /token/refresh rotates (the old refresh token is revoked), so concurrent
+// 401s share one in-flight refresh instead of racing each other.
+let refreshing = null;
+
+const refreshSession = () => {
+    if (!refreshing) {
+        const refreshToken = localStorage.getItem('refresh_token');
+        refreshing = (refreshToken
+            ? axios.post(`${API_URL}/token/refresh`, { refresh_token: refreshToken })
+            : Promise.reject(new Error('No refresh token'))
+        )
+            .then(({ data }) => {
+                localStorage.setItem('token', data.token);
+                localStorage.setItem('refresh_token', data.refresh_token);
+                return data.token;
+            })
+            .catch((error) => {
+                // session is over; the next login issues new tokens
+                localStorage.removeItem('token');
+                localStorage.removeItem('refresh_token');
+                throw error;
+            })
+            .finally(() => {
+                refreshing = null;
+            });
+    }
+    return refreshing;
+};
+
+api.interceptors.response.use(
+    (response) => response,
+    async (error) => {
+        const config = error.config;
+        const isAuthCall = /\/(login|token\/refresh)$/.test(config?.url || '');
+        if (error.response?.status !== 401 || !config || config._retried || isAuthCall) {
+            return Promise.reject(error);
+        }
+        config._retried = true;
+        try {
+            const token = await refreshSession();
+            config.headers.Authorization = `Bearer ${token}`;
+            return api(config);
+        } catch {
+            return Promise.reject(error);
+        }
+    }
+);
+
+// ✅ End the session: revoke both tokens server-side, then forget them locally
+export const logout = async () => {
+    const refreshToken = localStorage.getItem('refresh_token');
+    try {
+        if (localStorage.getItem('token') || refreshToken) {
+            await api.post('/logout', refreshToken ? { refresh_token: refreshToken } : undefined);
+        }
+    } catch (error) {
+        console.warn('Logout request failed; clearing the local session anyway', error);
+    } finally {
+        localStorage.removeItem('token');
+        localStorage.removeItem('refresh_token');
+        localStorage.removeItem('fosys_user');
+    }
+};
+
 console.log("✅ Using backend at:", API_URL);  // <-- Add this for debugging
 export default api;
@@ -0,0 +1,295 @@
+# ============================
+# 📈 Team Analytics Engine
+# ============================
+# Columnar copies of `tasks`, `PR` and `ci_checks` held in NumPy arrays.
+# Rows are loaded in pages and upserted by id, so server.py can keep the
+# columns current from its write paths. Rollups are computed with
+# vectorized group-bys and cached until the underlying columns change.
+# A full load builds new columns without holding the lock and swaps them
+# in at the end, so writers and readers only ever wait for the swap.
+import threading
+
+import numpy as np
+
+COMPLETED_TASK_STATUSES = {"completed", "done"}
+CI_FAILURE_CONCLUSIONS = {"failure", "timed_out", "cancelled", "action_required", "startup_failure"}
+NAT = np.datetime64("NaT", "s")
+
+
+class Categories:
+    """Maps repeated string values to dense int32 codes. Code 0 is reserved for missing values."""
+
+    def __init__(self):
+        self.values: list = [None]
+        self._codes: dict = {None: 0}
+
+    def encode(self, items) -> np.ndarray:
+        codes = self._codes
+        out = np.empty(len(items), dtype=np.int32)
+        for i, item in enumerate(items):
+            code = codes.get(item)
+            if code is None:
+                code = codes[item] = len(self.values)
+                self.values.append(item)
+            out[i] = code
+        return out
+
+    def codes_for(self, predicate) -> np.ndarray:
+        return np.array([i for i, v in enumerate(self.values) if v is not None and predicate(v)], dtype=np.int32)
+
+    def __len__(self):
+        return len(self.values)
+
+
+def parse_times(items) -> np.ndarray:
+    # Supabase timestamps look like "2025-11-01T07:28:28.123+00:00"; seconds precision is enough here
+    return np.array([s[:19] if s else "NaT" for s in items], dtype="datetime64[s]")
+
+
+class ColumnTable:
+    """Growable set of aligned NumPy columns keyed by row id.
+
+    `schema` maps column name -> "category" | "time". A category column is
+    stored as int32 codes with a shared Categories per column.
+    """
+
+    def __init__(self, schema: dict, capacity: int = 1024):
+        self.schema = schema
+        self.size = 0
+        self.version = 0
+        self._pos: dict = {}
+        self.categories = {name: Categories() for name, kind in schema.items() if kind == "category"}
+        self.columns = {name: self._empty(kind, capacity) for name, kind in schema.items()}
+
+    @staticmethod
+    def _empty(kind: str, n: int) -> np.ndarray:
+        if kind == "time":
+            return np.full(n, NAT, dtype="datetime64[s]")
+        return np.zeros(n, dtype=np.int32)
+
+    def _grow(self, needed: int):
+        capacity = len(next(iter(self.columns.values())))
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2)
+        for name, kind in self.schema.items():
+            grown = self._empty(kind, new_capacity)
+            grown[:self.size] = self.columns[name][:self.size]
+            self.columns[name] = grown
+
+    def upsert(self, ids: list, values: dict):
+        """Write one chunk of full rows. `values` maps column name -> list aligned with `ids`."""
+        if not ids:
+            return
+        positions = np.empty(len(ids), dtype=np.int64)
+        next_pos = self.size
+        for i, row_id in enumerate(ids):
+            pos = self._pos.get(row_id)
+            if pos is None:
+                pos = self._pos[row_id] = next_pos
+                next_pos += 1
+            positions[i] = pos
+        self._grow(next_pos)
+        for name, kind in self.schema.items():
+            if kind == "time":
+                encoded = parse_times(values[name])
+            else:
+                encoded = self.categories[name].encode(values[name])
+            self.columns[name][positions] = encoded
+        self.size = next_pos
+        self.version += 1
+
+    def column(self, name: str) -> np.ndarray:
+        return self.columns[name][:self.size]
+
+
+def rows_to_columns(rows: list, fields: dict):
+    """Split a page of row dicts into (ids, {column: values}); `fields` maps column -> getter."""
+    ids = [r.get("id") for r in rows]
+    return ids, {name: [getter(r) for r in rows] for name, getter in fields.items()}
+
+
+TASK_FIELDS = {
+    "assigned_to": lambda r: r.get("assigned_to") or None,
+    "status": lambda r: (r.get("status") or "").lower() or None,
+    "created_at": lambda r: r.get("created_at"),
+}
+PR_FIELDS = {
+    "author": lambda r: r.get("authorId"),
+    "repo": lambda r: f"{r.get('repo_owner')}/{r.get('repo_name')}",
+    "status": lambda r: r.get("status"),
+    "created_at": lambda r: r.get("createdAt"),
+    "updated_at": lambda r: r.get("last_updated_at"),
+}
+CI_FIELDS = {
+    "repo": lambda r: f"{r.get('repo_owner')}/{r.get('repo_name')}",
+    "status": lambda r: r.get("status"),
+    "conclusion": lambda r: r.get("conclusion"),
+}
+
+
+def group_sizes(codes: np.ndarray, n_groups: int, weights: np.ndarray | None = None) -> np.ndarray:
+    return np.bincount(codes, weights=weights, minlength=n_groups)
+
+
+def group_medians(codes: np.ndarray, values: np.ndarray) -> dict:
+    """Median of `values` per group code, via one sort instead of a loop over groups."""
+    if len(codes) == 0:
+        return {}
+    order = np.lexsort((values, codes))
+    codes, values = codes[order], values[order]
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    ends = np.r_[starts[1:], len(codes)]
+    lo = values[starts + (ends - starts - 1) // 2]
+    hi = values[starts + (ends - starts) // 2]
+    return dict(zip(codes[starts].tolist(), ((lo + hi) / 2).tolist()))
+
+
+TABLE_SCHEMAS = {
+    "tasks": {"assigned_to": "category", "status": "category", "created_at": "time"},
+    "prs": {"author": "category", "repo": "category", "status": "category",
+            "created_at": "time", "updated_at": "time"},
+    "ci": {"repo": "category", "status": "category", "conclusion": "category"},
+}
+TABLE_FIELDS = {"tasks": TASK_FIELDS, "prs": PR_FIELDS, "ci": CI_FIELDS}
+
+
+class TeamAnalytics:
+    """Columnar tasks / PR / ci_checks with cached throughput, cycle-time and CI rollups."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.tasks = ColumnTable(TABLE_SCHEMAS["tasks"])
+        self.prs = ColumnTable(TABLE_SCHEMAS["prs"])
+        self.ci = ColumnTable(TABLE_SCHEMAS["ci"])
+        self._cache: dict = {}
+        # while a load runs: writes made meanwhile, replayed onto the new columns before the swap
+        self._pending: list | None = None
+
+    # ---------- loading ----------
+    def load_pages(self, tasks_pages=(), pr_pages=(), ci_pages=()):
+        """Replace all columns from iterables of row pages. Callers must not run two loads at once.
+
+        The pages (typically network reads) are consumed without holding the
+        lock; concurrent upserts go to the current columns and are also
+        replayed onto the new ones, so none are lost by the swap.
+        """
+        with self._lock:
+            self._pending = []
+        try:
+            fresh = {name: ColumnTable(schema) for name, schema in TABLE_SCHEMAS.items()}
+            for name, pages in (("tasks", tasks_pages), ("prs", pr_pages), ("ci", ci_pages)):
+                for page in pages:
+                    fresh[name].upsert(*rows_to_columns(page, TABLE_FIELDS[name]))
+            with self._lock:
+                for name, rows in self._pending:
+                    fresh[name].upsert(*rows_to_columns(rows, TABLE_FIELDS[name]))
+                self.tasks, self.prs, self.ci = fresh["tasks"], fresh["prs"], fresh["ci"]
+                # new tables restart their version counters
+                self._cache.clear()
+        finally:
+            with self._lock:
+                self._pending = None
+
+    def _upsert(self, name: str, rows: list):
+        with self._lock:
+            getattr(self, name).upsert(*rows_to_columns(rows, TABLE_FIELDS[name]))
+            if self._pending is not None:
+                self._pending.append((name, rows))
+
+    def upsert_tasks(self, rows: list):
+        self._upsert("tasks", rows)
+
+    def upsert_prs(self, rows: list):
+        self._upsert("prs", rows)
+
+    def upsert_ci_checks(self, rows: list):
+        self._upsert("ci", rows)
+
+    def _cached(self, name: str, table_name: str, compute):
+        with self._lock:
+            table = getattr(self, table_name)  # resolved under the lock; a load may have swapped it
+            hit = self._cache.get(name)
+            if hit is not None and hit[0] == table.version:
+                return hit[1]
+            result = compute()
+            self._cache[name] = (table.version, result)
+            return result
+
+    # ---------- rollups ----------
+    def tasks_completed_per_week(self) -> list:
+        """Completed tasks per assignee per ISO week.
+
+        `tasks` has no completion timestamp, so tasks are bucketed by created_at.
+        """
+        def compute():
+            t = self.tasks
+            status = t.column("status")
+            created = t.column("created_at")
+            mask = np.isin(status, t.categories["status"].codes_for(lambda s: s in COMPLETED_TASK_STATUSES))
+            mask &= ~np.isnat(created)
+            if not mask.any():
+                return []
+            # days since epoch -> Monday-aligned week number (1970-01-01 was a Thursday)
+            weeks = (created[mask].astype("datetime64[D]").astype(np.int64) + 3) // 7
+            assignees = t.column("assigned_to")[mask].astype(np.int64)
+            keys, counts = np.unique(assignees * (1 << 32) + weeks, return_counts=True)
+            names = t.categories["assigned_to"].values
+            week_starts = ((keys & 0xFFFFFFFF) * 7 - 3).astype("datetime64[D]")
+            return [
+                {"assigned_to": names[int(a)], "week_start": str(w), "completed": int(c)}
+                for a, w, c in zip(keys >> 32, week_starts, counts)
+            ]
+        return self._cached("tasks_completed_per_week", "tasks", compute)
+
+    def pr_cycle_time(self, by: str = "repo") -> list:
+        """Hours from createdAt to merge, per repo or author.
+
+        PR has no merged_at column; last_updated_at of a merged PR is the merge event.
+        """
+        def compute():
+            p = self.prs
+            created, updated = p.column("created_at"), p.column("updated_at")
+            merged_codes = p.categories["status"].codes_for(lambda s: s == "merged")
+            mask = np.isin(p.column("status"), merged_codes) & ~np.isnat(created) & ~np.isnat(updated)
+            codes = p.column(by)[mask]
+            hours = (updated[mask] - created[mask]).astype(np.int64) / 3600.0
+            n = len(p.categories[by])
+            counts = group_sizes(codes, n)
+            totals = group_sizes(codes, n, hours)
+            medians = group_medians(codes, hours)
+            names = p.categories[by].values
+            return [
+                {by: names[g], "merged": int(counts[g]), "mean_hours": round(float(totals[g] / counts[g]), 2),
+                 "p50_hours": round(medians[g], 2)}
+                for g in np.flatnonzero(counts)
+            ]
+        return self._cached(f"pr_cycle_time:{by}", "prs", compute)
+
+    def ci_failure_rate(self) -> list:
+        """Share of completed checks that failed, per repo."""
+        def compute():
+            c = self.ci
+            completed = np.isin(c.column("status"), c.categories["status"].codes_for(lambda s: s == "completed"))
+            failed = completed & np.isin(c.column("conclusion"),
+                                         c.categories["conclusion"].codes_for(lambda s: s in CI_FAILURE_CONCLUSIONS))
+            repos = c.column("repo")
+            n = len(c.categories["repo"])
+            done = group_sizes(repos[completed], n)
+            failures = group_sizes(repos[failed], n)
+            names = c.categories["repo"].values
+            return [
+                {"repo": names[g], "completed": int(done[g]), "failed": int(failures[g]),
+                 "failure_rate": round(float(failures[g] / done[g]), 4)}
+                for g in np.flatnonzero(done)
+            ]
+        return self._cached("ci_failure_rate", "ci", compute)
+
+    def summary(self) -> dict:
+        return {
+            "rows": {"tasks": self.tasks.size, "prs": self.prs.size, "ci_checks": self.ci.size},
+            "tasks_completed_per_week": self.tasks_completed_per_week(),
+            "pr_cycle_time_by_repo": self.pr_cycle_time("repo"),
+            "pr_cycle_time_by_author": self.pr_cycle_time("author"),
+            "ci_failure_rate_by_repo": self.ci_failure_rate(),
+        }
@@ -0,0 +1,109 @@
+# bench_analytics.py
+# Times the analytics engine on synthetic data: paged loading into NumPy
+# columns, the first (cold) rollup computation, and cached / incremental reads.
+#   python bench_analytics.py            # 1M rows per table
+#   ROWS=200000 python bench_analytics.py
+import os, random, threading, time
+from datetime import datetime, timedelta
+
+from analytics import TeamAnalytics
+
+ROWS = int(os.environ.get("ROWS", "1000000"))
+PAGE = 1000  # same page size as server.iter_table_pages
+random.seed(7)
+
+employees = [f"user{i}@fosys.com" for i in range(500)]
+repos = [("fosys", f"repo-{i}") for i in range(40)]
+start = datetime(2025, 1, 1)
+
+
+def ts(offset_hours: float) -> str:
+    return (start + timedelta(hours=offset_hours)).isoformat() + "+00:00"
+
+
+def task_pages():
+    for base in range(0, ROWS, PAGE):
+        yield [{
+            "id": i,
+            "assigned_to": random.choice(employees),
+            "status": random.choice(("Pending", "In Progress", "Completed")),
+            "created_at": ts(random.uniform(0, 24 * 300)),
+        } for i in range(base, min(base + PAGE, ROWS))]
+
+
+def pr_pages():
+    for base in range(0, ROWS, PAGE):
+        page = []
+        for i in range(base, min(base + PAGE, ROWS)):
+            opened = random.uniform(0, 24 * 300)
+            owner, name = random.choice(repos)
+            page.append({
+                "id": i, "authorId": random.randrange(500), "repo_owner": owner, "repo_name": name,
+                "status": random.choice(("open", "merged", "merged", "closed")),
+                "createdAt": ts(opened), "last_updated_at": ts(opened + random.expovariate(1 / 30)),
+            })
+        yield page
+
+
+def ci_pages():
+    for base in range(0, ROWS, PAGE):
+        page = []
+        for i in range(base, min(base + PAGE, ROWS)):
+            owner, name = random.choice(repos)
+            page.append({
+                "id": i, "repo_owner": owner, "repo_name": name,
+                "status": random.choice(("completed", "completed", "in_progress")),
+                "conclusion": random.choice(("success", "success", "success", "failure", None)),
+            })
+        yield page
+
+
+def timed(label, fn):
+    started = time.perf_counter()
+    result = fn()
+    print(f"{label:<32} {time.perf_counter() - started:8.3f}s")
+    return result
+
+
+print(f"generating {ROWS:,} rows per table...")
+pages = (list(task_pages()), list(pr_pages()), list(ci_pages()))
+
+engine = TeamAnalytics()
+timed("load (paged upsert)", lambda: engine.load_pages(*pages))
+summary = timed("rollups (cold)", engine.summary)
+timed("rollups (cached)", engine.summary)
+timed("upsert 1 task page", lambda: engine.upsert_tasks(pages[0][0]))
+timed("rollups after 1 page change", engine.summary)
+
+print("groups:", {k: len(v) for k, v in summary.items() if isinstance(v, list)})
+
+
+# Reload while a webhook-like writer keeps upserting: the writer should only
+# ever wait for the final swap, and its rows should survive the reload.
+def slow_pages(table_pages):
+    for page in table_pages:
+        time.sleep(0.0005)  # stands in for one PostgREST round trip
+        yield page
+
+
+write_latencies, done = [], threading.Event()
+
+
+def writer():
+    n = ROWS
+    while not done.is_set():
+        started = time.perf_counter()
+        engine.upsert_tasks([{"id": n, "assigned_to": "late@fosys.com", "status": "Completed",
+                              "created_at": ts(1)}])
+        write_latencies.append(time.perf_counter() - started)
+        n += 1
+        time.sleep(0.001)
+
+
+t = threading.Thread(target=writer)
+t.start()
+timed("reload with concurrent writes", lambda: engine.load_pages(*(slow_pages(p) for p in pages)))
+done.set()
+t.join()
+print(f"writes during reload: n={len(write_latencies)} max={max(write_latencies) * 1000:.1f}ms, "
+      f"kept={engine.tasks.size - ROWS}")
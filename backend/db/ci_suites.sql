@@ -0,0 +1,32 @@
+-- ============================================================================
+-- CI Suite Results
+-- ============================================================================
+--
+-- Purpose: One row per check suite (or workflow run) per commit, holding the
+-- suite's current pending/passing/failing result. server.py upserts a row on
+-- every check_suite / workflow_run webhook and derives PR.ci_overall from all
+-- of the commit's rows, so the result is the same whichever worker handles
+-- the delivery and survives restarts.
+--
+-- Compatibility: Supabase/PostgreSQL
+--
+-- Usage: Run this script in the SQL Editor of the AUTH Supabase project (the
+-- one holding "PR" and ci_checks, behind supabase_auth in server.py).
+--
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS ci_suites (
+    id SERIAL PRIMARY KEY,
+    repo_owner TEXT NOT NULL,
+    repo_name TEXT NOT NULL,
+    head_sha TEXT NOT NULL,
+    suite_id TEXT NOT NULL,
+    overall TEXT NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    -- upsert target, and serves "all suites of this commit"
+    UNIQUE (repo_owner, repo_name, head_sha, suite_id)
+);
+
+COMMENT ON TABLE ci_suites IS 'Latest result of each check suite per commit; PR.ci_overall combines them';
+COMMENT ON COLUMN ci_suites.suite_id IS 'GitHub check_suite id, or workflow_run:<id> when a run has no suite id';
+COMMENT ON COLUMN ci_suites.overall IS 'pending | passing | failing';
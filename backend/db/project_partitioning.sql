@@ -0,0 +1,29 @@
+-- ============================================================================
+-- Project-scoped Tasks and Transcripts
+-- ============================================================================
+-- 
+-- Purpose: Adds a project_id to the `tasks` and `transcripts` tables used by
+-- server.py, with per-project indexes so project-scoped reads
+-- (GET /projects/{id}/tasks, GET /projects/{id}/meeting-transcript) scan
+-- only that project's rows.
+-- 
+-- Compatibility: Supabase/PostgreSQL
+-- 
+-- Usage: Run this script in the SQL Editor of the TRANSCRIPTS Supabase
+-- project (the one behind supabase_transcript in server.py).
+-- 
+-- ============================================================================
+
+-- Project the row belongs to (Project.id in the Prisma schema); NULL for
+-- rows created before projects were tracked
+ALTER TABLE tasks ADD COLUMN IF NOT EXISTS project_id INTEGER;
+ALTER TABLE transcripts ADD COLUMN IF NOT EXISTS project_id INTEGER;
+
+-- Serve "WHERE project_id = ? ORDER BY created_at DESC" straight from the index
+CREATE INDEX IF NOT EXISTS idx_tasks_project_created_at
+    ON tasks (project_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_transcripts_project_created_at
+    ON transcripts (project_id, created_at DESC);
+
+COMMENT ON COLUMN tasks.project_id IS 'Project.id this task belongs to (NULL = unscoped)';
+COMMENT ON COLUMN transcripts.project_id IS 'Project.id this meeting transcript belongs to (NULL = unscoped)';
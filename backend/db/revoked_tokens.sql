@@ -0,0 +1,31 @@
+-- ============================================================================
+-- Revoked Refresh Tokens
+-- ============================================================================
+--
+-- Purpose: Shared record of refresh tokens that were used (rotation) or
+-- revoked by /logout, so every server.py worker rejects them. server.py
+-- inserts a token's jti when it is used; the primary key makes a second
+-- use of the same token fail, whichever worker receives it.
+-- Access tokens are short-lived and are only revoked in the worker that
+-- handled /logout.
+--
+-- Compatibility: Supabase/PostgreSQL
+--
+-- Usage: Run this script in the SQL Editor of the AUTH Supabase project (the
+-- one behind supabase_auth in server.py). Expired rows can be removed at any
+-- time, e.g. from a scheduled job:
+--   DELETE FROM revoked_tokens WHERE expires_at < NOW();
+--
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS revoked_tokens (
+    jti TEXT PRIMARY KEY,
+    expires_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    revoked_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- For the periodic cleanup of expired rows
+CREATE INDEX IF NOT EXISTS idx_revoked_tokens_expires_at ON revoked_tokens(expires_at);
+
+COMMENT ON TABLE revoked_tokens IS 'Refresh token ids that can no longer be used (rotated or logged out)';
+COMMENT ON COLUMN revoked_tokens.expires_at IS 'When the token would have expired anyway; the row is useless after this';
@@ -0,0 +1,21 @@
+-- ============================================================================
+-- Transcript Fingerprints
+-- ============================================================================
+--
+-- Purpose: Stores each transcript's duplicate-detection fingerprint (see
+-- dedup.py) next to it. server.py writes it when a transcript is saved and
+-- builds its in-memory duplicate index from this column at startup, so the
+-- index can be rebuilt without downloading and re-fingerprinting every
+-- transcript. Rows saved before this column existed are fingerprinted once,
+-- on the first startup after the migration, and written back.
+--
+-- Compatibility: Supabase/PostgreSQL
+--
+-- Usage: Run this script in the SQL Editor of the TRANSCRIPTS Supabase
+-- project (the one behind supabase_transcript in server.py).
+--
+-- ============================================================================
+
+ALTER TABLE transcripts ADD COLUMN IF NOT EXISTS fingerprint TEXT;
+
+COMMENT ON COLUMN transcripts.fingerprint IS 'base64 of the sha256 of the normalized text followed by the 64 x uint32 MinHash signature';
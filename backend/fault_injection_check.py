@@ -0,0 +1,228 @@
+# fault_injection_check.py
+# Exercises resilience.py against a local fault-injecting stub of the
+# supabase query builder, then against real postgrest builders whose HTTP
+# transport is stubbed (no network needed; postgrest ships with supabase):
+#   python fault_injection_check.py
+import threading, time
+
+import httpx
+from postgrest import SyncPostgrestClient
+
+from resilience import CircuitBreaker, DatabaseUnavailable, GuardedClient, ResilientDatabase
+
+
+class APIError(Exception):
+    def __init__(self, code):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+
+class StubQuery:
+    """Stands in for a postgrest request builder; `fault()` decides what each execute() does."""
+
+    def __init__(self, table, http_method="GET"):
+        self.table = table
+        self.http_method = http_method
+
+    def select(self, *_):
+        return self
+
+    def eq(self, *_):
+        return self
+
+    def insert(self, *_):
+        return StubQuery(self.table, "POST")
+
+    def execute(self):
+        self.table.calls += 1
+        return self.table.fault()
+
+
+class StubTable:
+    def __init__(self, fault):
+        self.fault = fault
+        self.calls = 0
+
+
+class StubClient:
+    def __init__(self, fault):
+        self.stub = StubTable(fault)
+
+    def table(self, name):
+        return StubQuery(self.stub)
+
+
+def failing_then_ok(failures, exc=lambda: ConnectionError("reset by peer")):
+    state = {"left": failures}
+
+    def fault():
+        if state["left"] > 0:
+            state["left"] -= 1
+            raise exc()
+        return "ok"
+    return fault
+
+
+def always(exc):
+    def fault():
+        raise exc()
+    return fault
+
+
+def slow(seconds):
+    def fault():
+        time.sleep(seconds)
+        return "ok"
+    return fault
+
+
+def check(label, cond):
+    print(("ok   " if cond else "FAIL ") + label)
+    assert cond, label
+
+
+# 1) transient errors on reads are retried with jitter
+db = ResilientDatabase("t", deadline=2, max_concurrency=5)
+client = GuardedClient(StubClient(failing_then_ok(2)), db)
+check("read retried through 2 transient failures", client.table("x").select("*").eq("a", 1).execute() == "ok")
+check("read made 3 attempts", client._client.stub.calls == 3 and db.counters["retries"] == 2)
+
+# 2) writes are never retried
+db = ResilientDatabase("t", deadline=2, max_concurrency=5)
+client = GuardedClient(StubClient(failing_then_ok(1)), db)
+try:
+    client.table("x").insert({}).execute()
+    check("write raised", False)
+except ConnectionError:
+    check("write not retried", client._client.stub.calls == 1)
+
+# 3) 4xx answers are not retried and don't trip the breaker
+db = ResilientDatabase("t", deadline=2, max_concurrency=5, breaker=CircuitBreaker(failure_threshold=2))
+client = GuardedClient(StubClient(always(lambda: APIError("409"))), db)
+for _ in range(5):
+    try:
+        client.table("x").select("*").execute()
+    except APIError:
+        pass
+check("4xx not retried", client._client.stub.calls == 5)
+check("4xx keeps breaker closed", db.breaker.state == "closed")
+
+# 4) breaker opens, fails fast, then half-opens and recovers
+db = ResilientDatabase("t", deadline=2, max_concurrency=5, retries=0,
+                       breaker=CircuitBreaker(failure_threshold=3, reset_timeout=0.2))
+outage = {"down": True}
+
+
+def during_outage():
+    if outage["down"]:
+        raise TimeoutError()
+    return "ok"
+
+
+client = GuardedClient(StubClient(during_outage), db)
+for _ in range(3):
+    try:
+        client.table("x").select("*").execute()
+    except TimeoutError:
+        pass
+check("breaker opened after 3 failures", db.breaker.state == "open")
+started = time.perf_counter()
+try:
+    client.table("x").select("*").execute()
+except DatabaseUnavailable:
+    pass
+check("open breaker fails fast without calling the db",
+      client._client.stub.calls == 3 and time.perf_counter() - started < 0.01)
+outage["down"] = False
+time.sleep(0.25)
+check("half-open trial succeeds and closes", client.table("x").select("*").execute() == "ok" and db.breaker.state == "closed")
+
+# 5) bulkheads: a stalled transcript db can't starve auth calls
+auth_db = ResilientDatabase("auth", deadline=2, max_concurrency=20)
+transcript_db = ResilientDatabase("transcript", deadline=5, max_concurrency=5, bulkhead_wait=0.05)
+auth = GuardedClient(StubClient(slow(0.01)), auth_db)
+transcript = GuardedClient(StubClient(slow(1.0)), transcript_db)
+rejected, auth_latency = [], []
+
+
+def transcript_call():
+    try:
+        transcript.table("transcripts").select("*").execute()
+    except DatabaseUnavailable:
+        rejected.append(1)
+
+
+def auth_call():
+    started = time.perf_counter()
+    auth.table("employee").select("*").execute()
+    auth_latency.append(time.perf_counter() - started)
+
+
+threads = [threading.Thread(target=transcript_call) for _ in range(30)]
+threads += [threading.Thread(target=auth_call) for _ in range(20)]
+for th in threads:
+    th.start()
+for th in threads:
+    th.join()
+check("excess transcript calls rejected by bulkhead", len(rejected) == 25)
+check("auth calls unaffected by stalled transcript db (max %.0fms)" % (max(auth_latency) * 1000),
+      max(auth_latency) < 0.2)
+
+# 6) retries never push a call past its deadline
+def slow_failure(seconds):
+    def fault():
+        time.sleep(seconds)
+        raise TimeoutError()
+    return fault
+
+
+for attempt_timeout in (0.6, None):  # explicit, and the deadline / (retries + 1) default
+    db = ResilientDatabase("t", deadline=1.0, max_concurrency=5, attempt_timeout=attempt_timeout)
+    client = GuardedClient(StubClient(slow_failure(db.attempt_timeout)), db)
+    started = time.perf_counter()
+    try:
+        client.table("x").select("*").execute()
+    except TimeoutError:
+        pass
+    elapsed = time.perf_counter() - started
+    check("attempts of %.2fs stay within 1.0s deadline (%.2fs, %d attempts)"
+          % (db.attempt_timeout, elapsed, client._client.stub.calls), elapsed < 1.0 + 0.05)
+
+print("stats:", {"auth": auth_db.stats(), "transcript": transcript_db.stats()})
+
+
+# 7) real postgrest builders: method detection and postgrest's own retries
+def postgrest_client(db, responses):
+    """GuardedClient over a SyncPostgrestClient whose transport replays `responses` (status codes or exceptions)."""
+    calls = []
+
+    def handler(request):
+        calls.append(request.method)
+        outcome = responses[min(len(calls), len(responses)) - 1]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return httpx.Response(outcome, json=[] if outcome < 400 else {"message": "unavailable", "code": str(outcome)})
+
+    http = httpx.Client(base_url="http://db.invalid/rest/v1", transport=httpx.MockTransport(handler))
+    return GuardedClient(SyncPostgrestClient("http://db.invalid/rest/v1", http_client=http), db), calls
+
+
+db = ResilientDatabase("t", deadline=5, max_concurrency=5, backoff_base=0.01)
+client, calls = postgrest_client(db, [httpx.ConnectError("refused"), httpx.ConnectError("refused"), 200])
+client.table("x").select("*").eq("a", 1).execute()
+check("postgrest select is retried as a read", calls == ["GET"] * 3 and db.counters["retries"] == 2)
+
+db = ResilientDatabase("t", deadline=5, max_concurrency=5, backoff_base=0.01)
+client, calls = postgrest_client(db, [503, 503, 200])
+started = time.perf_counter()
+client.table("x").select("*").execute()
+check("postgrest's built-in 503 retry sleeps are disabled (%.2fs)" % (time.perf_counter() - started),
+      len(calls) == 3 and db.counters["retries"] == 2 and time.perf_counter() - started < 0.5)
+
+db = ResilientDatabase("t", deadline=5, max_concurrency=5, backoff_base=0.01)
+client, calls = postgrest_client(db, [httpx.ConnectError("refused"), 201])
+try:
+    client.table("x").insert({"a": 1}).execute()
+    check("postgrest insert raised", False)
+except httpx.ConnectError:
+    check("postgrest insert is not retried", calls == ["POST"])
@@ -0,0 +1,86 @@
+# load_test_login.py
+# Hammers /login with credential-stuffing traffic while one legitimate user
+# keeps logging in, then prints that user's latency and the limiter counters.
+#
+# Run the server with TRUST_FORWARDED_FOR=true so attacker threads can spoof
+# many client IPs, e.g.:
+#   TRUST_FORWARDED_FOR=true uvicorn server:app --workers 1
+#   LOGIN_EMAIL=me@fosys.com LOGIN_PASSWORD=... python load_test_login.py
+import os, random, statistics, threading, time
+import requests
+
+BASE_URL = os.environ.get("BACKEND_URL", "http://127.0.0.1:8000")
+LOGIN_EMAIL = os.environ.get("LOGIN_EMAIL", "employee@fosys.com")
+LOGIN_PASSWORD = os.environ.get("LOGIN_PASSWORD", "password")
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")  # optional, to read /auth/rate-limits
+ATTACK_THREADS = int(os.environ.get("ATTACK_THREADS", "32"))
+DURATION = float(os.environ.get("DURATION", "30"))
+
+stop = threading.Event()
+attack_codes = {}
+attack_lock = threading.Lock()
+
+
+def attacker(n: int):
+    session = requests.Session()
+    while not stop.is_set():
+        ip = f"10.{n}.{random.randint(0, 255)}.{random.randint(1, 254)}"
+        body = {"email": f"victim{random.randint(0, 50)}@fosys.com", "password": "hunter2"}
+        try:
+            r = session.post(f"{BASE_URL}/login", json=body, headers={"X-Forwarded-For": ip}, timeout=10)
+            code = r.status_code
+        except requests.RequestException:
+            code = "error"
+        with attack_lock:
+            attack_codes[code] = attack_codes.get(code, 0) + 1
+
+
+def legit_user(latencies: list, failures: list):
+    session = requests.Session()
+    body = {"email": LOGIN_EMAIL, "password": LOGIN_PASSWORD}
+    while not stop.is_set():
+        started = time.perf_counter()
+        r = session.post(f"{BASE_URL}/login", json=body, headers={"X-Forwarded-For": "192.0.2.10"}, timeout=10)
+        latencies.append((time.perf_counter() - started) * 1000)
+        if r.status_code != 200:
+            failures.append(r.status_code)
+        time.sleep(15)  # stays inside the default per-email budget
+
+
+def report(label: str, latencies: list):
+    if not latencies:
+        print(f"{label}: no samples")
+        return
+    ordered = sorted(latencies)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    print(f"{label}: n={len(ordered)} p50={statistics.median(ordered):.1f}ms p95={p95:.1f}ms max={ordered[-1]:.1f}ms")
+
+
+# Baseline with no attack traffic
+baseline, baseline_failures = [], []
+t = threading.Thread(target=legit_user, args=(baseline, baseline_failures))
+t.start()
+time.sleep(min(DURATION, 31))
+stop.set()
+t.join()
+
+# Same user under attack
+stop.clear()
+under_attack, attack_failures = [], []
+threads = [threading.Thread(target=attacker, args=(i,)) for i in range(ATTACK_THREADS)]
+threads.append(threading.Thread(target=legit_user, args=(under_attack, attack_failures)))
+for th in threads:
+    th.start()
+time.sleep(DURATION)
+stop.set()
+for th in threads:
+    th.join()
+
+report("legit login (baseline)", baseline)
+report("legit login (under attack)", under_attack)
+print("legit failures:", baseline_failures + attack_failures)
+print("attack responses:", attack_codes)
+
+if ADMIN_TOKEN:
+    r = requests.get(f"{BASE_URL}/auth/rate-limits", headers={"Authorization": f"Bearer {ADMIN_TOKEN}"}, timeout=10)
+    print("limiter counters:", r.json())
@@ -12,6 +12,10 @@ export function protect(req, res, next) {
 
   try {
     const decoded = jwt.verify(token, process.env.JWT_SECRET);
+    // server.py tags its tokens; only access tokens may authorize a request
+    if (decoded.type && decoded.type !== 'access') {
+      return res.status(401).json({ error: 'Not authorized, wrong token type.' });
+    }
     req.user = decoded; // Attaches user info (id, role) to the request
     next();
   } catch (error) {
@@ -0,0 +1,184 @@
+# ============================
+# 🛡️ Database Resilience
+# ============================
+# Wraps a Supabase client so every `.execute()` goes through:
+#   - a bulkhead (bounded concurrency per database, fail fast when full)
+#   - a circuit breaker (fail fast while the database keeps failing)
+#   - bounded retries with full jitter, for idempotent (GET) queries only
+#   - a per-database deadline on the whole call: each attempt is capped by the
+#     HTTP client timeout (`attempt_timeout`), and a retry only starts if a
+#     full attempt can still finish inside the deadline
+# Each database gets its own ResilientDatabase, so a degraded one cannot
+# starve the workers serving the other.
+import random
+import threading
+import time
+
+try:
+    import httpx
+    TRANSIENT_ERRORS: tuple = (httpx.TransportError, TimeoutError, ConnectionError)
+except ImportError:  # supabase-py ships httpx; this keeps the module importable without it
+    TRANSIENT_ERRORS = (TimeoutError, ConnectionError)
+
+
+class DatabaseUnavailable(Exception):
+    """Raised without calling the database: circuit open or bulkhead full."""
+
+
+class CircuitBreaker:
+    """closed -> open after `failure_threshold` consecutive failures; one trial call after `reset_timeout`."""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+            if self.state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+
+def is_transient(exc: Exception) -> bool:
+    if isinstance(exc, TRANSIENT_ERRORS):
+        return True
+    # postgrest APIError carries the HTTP status in .code; only 5xx are the database's fault
+    code = str(getattr(exc, "code", "") or "")
+    return code.startswith("5")
+
+
+class ResilientDatabase:
+    def __init__(self, name: str, deadline: float, max_concurrency: int, retries: int = 2,
+                 attempt_timeout: float | None = None, backoff_base: float = 0.05, backoff_cap: float = 1.0,
+                 bulkhead_wait: float = 0.1, breaker: CircuitBreaker | None = None):
+        self.name = name
+        self.deadline = deadline
+        # what the HTTP client must be configured with; by default every attempt fits the deadline
+        self.attempt_timeout = attempt_timeout or deadline / (retries + 1)
+        self.max_concurrency = max_concurrency
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.bulkhead_wait = bulkhead_wait
+        self.breaker = breaker or CircuitBreaker()
+        self._bulkhead = threading.BoundedSemaphore(max_concurrency)
+        self.in_flight = 0
+        self.counters = {"calls": 0, "retries": 0, "failures": 0, "rejected_open": 0, "rejected_full": 0}
+
+    def execute(self, run, idempotent: bool):
+        """Call `run()` (a query's execute) under this database's bulkhead, breaker and retry policy."""
+        self.counters["calls"] += 1
+        if not self._bulkhead.acquire(timeout=self.bulkhead_wait):
+            self.counters["rejected_full"] += 1
+            raise DatabaseUnavailable(f"{self.name} database busy (bulkhead full)")
+        if not self.breaker.allow():
+            self._bulkhead.release()
+            self.counters["rejected_open"] += 1
+            raise DatabaseUnavailable(f"{self.name} database unavailable (circuit open)")
+
+        self.in_flight += 1
+        started = time.monotonic()
+        attempt = 0
+        try:
+            while True:
+                try:
+                    result = run()
+                except Exception as e:
+                    transient = is_transient(e)
+                    elapsed = time.monotonic() - started
+                    backoff = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+                    fits = elapsed + backoff + self.attempt_timeout <= self.deadline
+                    if transient and idempotent and attempt < self.retries and fits:
+                        attempt += 1
+                        self.counters["retries"] += 1
+                        time.sleep(backoff)
+                        continue
+                    if transient:
+                        self.counters["failures"] += 1
+                        self.breaker.record_failure()
+                    else:
+                        # the database answered (e.g. a 4xx); it is healthy
+                        self.breaker.record_success()
+                    raise
+                self.breaker.record_success()
+                return result
+        finally:
+            self.in_flight -= 1
+            self._bulkhead.release()
+
+    def stats(self) -> dict:
+        return {
+            "state": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "deadline_seconds": self.deadline,
+            "attempt_timeout_seconds": self.attempt_timeout,
+            **self.counters,
+        }
+
+
+class GuardedQuery:
+    """Proxy over a postgrest request builder whose execute() goes through a ResilientDatabase."""
+
+    def __init__(self, builder, db: ResilientDatabase):
+        self._builder = builder
+        self._db = db
+
+    def __getattr__(self, name):
+        attr = getattr(self._builder, name)
+        if not callable(attr):
+            return GuardedQuery(attr, self._db) if hasattr(attr, "execute") else attr
+
+        def call(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            return GuardedQuery(result, self._db) if hasattr(result, "execute") else result
+
+        return call
+
+    def execute(self):
+        builder = self._builder
+        # postgrest 2.x keeps the method on builder.request; older builders had it on the builder
+        method = getattr(getattr(builder, "request", None), "http_method", None) or getattr(builder, "http_method", "")
+        if callable(getattr(builder, "retry", None)):
+            # postgrest 2.x retries GETs on 503/520 with 1+2+4s sleeps; retries are ours to budget
+            builder.retry(False)
+        return self._db.execute(builder.execute, idempotent=str(method or "").upper() in ("GET", "HEAD"))
+
+
+class GuardedClient:
+    """Drop-in for a supabase Client: `.table(...)` queries are guarded, everything else passes through."""
+
+    def __init__(self, client, db: ResilientDatabase):
+        self._client = client
+        self.db = db
+
+    def table(self, name: str) -> GuardedQuery:
+        return GuardedQuery(self._client.table(name), self.db)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
@@ -1,11 +1,32 @@
 import json
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, HTTPException, Request, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from supabase import create_client, Client
+from fastapi.responses import PlainTextResponse, JSONResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exception_handlers import http_exception_handler
+from supabase import create_client, Client, ClientOptions
 from pydantic import BaseModel
 from datetime import datetime
 import bcrypt
 import logging, sys
+import atexit
+import queue
+import random
+import tempfile
+from logging.handlers import QueueHandler, QueueListener
+import threading
+import asyncio
+import csv
+import io
+from concurrent.futures import ThreadPoolExecutor
+import time
+import base64
+import secrets
+from collections import OrderedDict
+from contextlib import contextmanager
+import codecs
+import contextvars
+import bisect
 # --- GitHub webhook handler for FastAPI (paste into server.py) ---
 import os
 import hmac
@@ -15,26 +36,120 @@ import re
 from datetime import datetime
 from fastapi import Request, Header, HTTPException
 from dotenv import load_dotenv
+from analytics import TeamAnalytics
+from resilience import DatabaseUnavailable, GuardedClient, ResilientDatabase
+from dedup import Fingerprint, TranscriptIndex, fingerprint, fingerprint_stream
 load_dotenv()   # will load .env into os.environ
 
 
 # ============================
 # 🧠 Logging Setup
 # ============================
-# Configure logging to output to stdout
-logging.basicConfig(
-    stream=sys.stdout,
-    level=logging.INFO,
-    format="%(asctime)s | %(levelname)s | %(message)s",
-)
+# Records go onto a queue and a background listener thread formats and
+# writes them, so request handlers never block on stdout. The queue is
+# bounded (LOG_QUEUE_MAX_RECORDS); if stdout can't keep up, new records
+# are dropped and counted (see /admin/logging) rather than piling up in memory.
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        route = getattr(record, "route", None)
+        if route:
+            entry["route"] = route
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DeferredQueueHandler(QueueHandler):
+    """QueueHandler that leaves message formatting to the listener thread.
+
+    Drops the record when the queue is full instead of blocking the caller.
+    """
+
+    def __init__(self, queue_):
+        super().__init__(queue_)
+        self.dropped = 0
+
+    def prepare(self, record):
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class DrainingQueueListener(QueueListener):
+    """QueueListener whose stop waits for room in a full queue instead of raising queue.Full."""
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+class SampledLogger(logging.LoggerAdapter):
+    """Tags records with a route and keeps only a fraction of its sub-WARNING records.
+
+    Dropped records are rejected before a LogRecord is built or formatted.
+    """
+
+    def __init__(self, logger, route: str, rate: float):
+        super().__init__(logger, {"route": route})
+        self.route = route
+        self.rate = rate
+        self.emitted = 0
+        self.dropped = 0
+
+    def isEnabledFor(self, level):
+        if not self.logger.isEnabledFor(level):
+            return False
+        if level < logging.WARNING and self.rate < 1.0 and random.random() >= self.rate:
+            self.dropped += 1
+            return False
+        self.emitted += 1
+        return True
+
+    def stats(self) -> dict:
+        return {"rate": self.rate, "emitted": self.emitted, "dropped": self.dropped}
+
+
+def parse_sample_rates(spec: str) -> dict:
+    rates = {}
+    for part in spec.split(","):
+        route, _, rate = part.partition("=")
+        if route.strip() and rate.strip():
+            rates[route.strip()] = float(rate)
+    return rates
+
+
+log_stream_handler = logging.StreamHandler(sys.stdout)
+if os.environ.get("LOG_FORMAT", "json").lower() == "text":
+    log_stream_handler.setFormatter(logging.Formatter("%(asctime)s | %(levelname)s | %(message)s"))
+else:
+    log_stream_handler.setFormatter(JsonFormatter())
+
+LOG_QUEUE_MAX_RECORDS = int(os.environ.get("LOG_QUEUE_MAX_RECORDS", "10000"))
+log_queue: queue.Queue = queue.Queue(maxsize=LOG_QUEUE_MAX_RECORDS)
+log_listener = DrainingQueueListener(log_queue, log_stream_handler, respect_handler_level=True)
+log_listener.start()
+atexit.register(log_listener.stop)
+
+log_queue_handler = DeferredQueueHandler(log_queue)
+logging.basicConfig(level=logging.INFO, handlers=[log_queue_handler])
 logger = logging.getLogger(__name__)
 
-# optional safe fallback (not necessary here, but okay to keep)
-try:
-    logger
-except NameError:
-    import logging
-    logger = logging.getLogger(__name__)
+# Per-route sampling for high-volume paths, e.g. LOG_SAMPLE_RATES="webhook=0.1,list=0.1"
+LOG_SAMPLE_RATES = parse_sample_rates(os.environ.get("LOG_SAMPLE_RATES", "webhook=0.1,list=0.1"))
+webhook_logger = SampledLogger(logger, "webhook", LOG_SAMPLE_RATES.get("webhook", 1.0))
+list_logger = SampledLogger(logger, "list", LOG_SAMPLE_RATES.get("list", 1.0))
 
 # ============================
 # 🔗 Supabase Connections (2 Projects)
@@ -71,15 +186,105 @@ app.add_middleware(
 # ============================
 # 🧠 Supabase Clients
 # ============================
+# Each project gets its own deadline, breaker and concurrency bulkhead (see
+# resilience.py), so a slow transcript DB can't tie up the workers serving /login.
+# *_TIMEOUT bounds a whole call including retries; *_ATTEMPT_TIMEOUT is the
+# HTTP timeout of a single attempt.
+auth_db = ResilientDatabase(
+    "auth",
+    deadline=float(os.environ.get("SUPABASE_AUTH_TIMEOUT", "5")),
+    attempt_timeout=float(os.environ.get("SUPABASE_AUTH_ATTEMPT_TIMEOUT", "2")),
+    max_concurrency=int(os.environ.get("SUPABASE_AUTH_MAX_CONCURRENCY", "20")),
+)
+transcript_db = ResilientDatabase(
+    "transcript",
+    deadline=float(os.environ.get("SUPABASE_TRANSCRIPT_TIMEOUT", "15")),
+    attempt_timeout=float(os.environ.get("SUPABASE_TRANSCRIPT_ATTEMPT_TIMEOUT", "6")),
+    max_concurrency=int(os.environ.get("SUPABASE_TRANSCRIPT_MAX_CONCURRENCY", "10")),
+)
+
 try:
-    supabase_auth: Client = create_client(SUPABASE_AUTH_URL, SUPABASE_AUTH_KEY)
-    supabase_transcript: Client = create_client(SUPABASE_TRANSCRIPT_URL, SUPABASE_TRANSCRIPT_KEY)
+    supabase_auth: Client = GuardedClient(
+        create_client(SUPABASE_AUTH_URL, SUPABASE_AUTH_KEY, options=ClientOptions(postgrest_client_timeout=auth_db.attempt_timeout)),
+        auth_db,
+    )
+    supabase_transcript: Client = GuardedClient(
+        create_client(SUPABASE_TRANSCRIPT_URL, SUPABASE_TRANSCRIPT_KEY, options=ClientOptions(postgrest_client_timeout=transcript_db.attempt_timeout)),
+        transcript_db,
+    )
     logger.info("Supabase clients initialized successfully.")
 except Exception as e:
-    logger.error(f"💥 Failed to initialize Supabase clients: {e}")
+    logger.error("💥 Failed to initialize Supabase clients: %s", e)
     sys.exit(1)
 
 
+# A rejected or exhausted database call is a 503, not a 500. Routes wrap
+# unexpected errors in HTTPException(500), so the original is found on
+# __context__.
+@app.exception_handler(DatabaseUnavailable)
+async def database_unavailable_handler(request: Request, exc: DatabaseUnavailable):
+    logger.warning("🛡️ %s %s: %s", request.method, request.url.path, exc)
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "5"})
+
+
+@app.exception_handler(HTTPException)
+async def upgrade_database_unavailable(request: Request, exc: HTTPException):
+    if exc.status_code == 500 and isinstance(exc.__context__, DatabaseUnavailable):
+        return await database_unavailable_handler(request, exc.__context__)
+    return await http_exception_handler(request, exc)
+
+
+# ============================
+# 🗃️ In-process caches
+# ============================
+class LRUCache:
+    """Small bounded mapping; least recently used keys are evicted first.
+
+    With `ttl` (seconds) set, entries also expire that long after being set.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float | None = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires_at, value = item
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl: float | None = None):
+        ttl = ttl if ttl is not None else self.ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            item = self._data.pop(key, None)
+        return default if item is None else item[1]
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self):
+        return len(self._data)
+
+
+_MISSING = object()
+
+
 # ============================
 # 📦 Pydantic Models
 # ============================
@@ -94,12 +299,250 @@ class LoginData(BaseModel):
     email: str
     password: str
 
+class RefreshData(BaseModel):
+    refresh_token: str
+
 class TranscriptData(BaseModel):
     meeting_name: str
     transcript: str
     summary: str | None = None
     tasks: str | None = None
     pending_tasks: str | None = None
+    project_id: int | None = None
+
+class TranscriptUploadStart(BaseModel):
+    meeting_name: str
+    total_size: int | None = None
+    project_id: int | None = None
+
+class TranscriptDetails(BaseModel):
+    summary: str | None = None
+    tasks: str | None = None
+    pending_tasks: str | None = None
+
+# ============================
+# 🎟️ Session Tokens
+# ============================
+# HS256 JWTs. Access tokens are signed with the same JWT_SECRET as the Node
+# middleware (backend/middleware/auth.js), so either backend can verify them.
+# Refresh tokens use a different key (REFRESH_TOKEN_SECRET, or one derived
+# from JWT_SECRET), so they are not valid bearer tokens on any route.
+JWT_SECRET = os.environ.get("JWT_SECRET")
+if not JWT_SECRET:
+    # every worker must share the key, or tokens from one fail on the others
+    logger.error("💥 JWT_SECRET is not set")
+    sys.exit(1)
+REFRESH_TOKEN_SECRET = os.environ.get("REFRESH_TOKEN_SECRET") or hmac.new(
+    JWT_SECRET.encode("utf-8"), b"fosys refresh token", hashlib.sha256
+).hexdigest()
+TOKEN_SECRETS = {"access": JWT_SECRET, "refresh": REFRESH_TOKEN_SECRET}
+
+ACCESS_TOKEN_TTL_SECONDS = int(os.environ.get("ACCESS_TOKEN_TTL_SECONDS", "900"))
+REFRESH_TOKEN_TTL_SECONDS = int(os.environ.get("REFRESH_TOKEN_TTL_SECONDS", str(7 * 24 * 3600)))
+ROLE_CACHE_TTL_SECONDS = int(os.environ.get("ROLE_CACHE_TTL_SECONDS", "300"))
+
+# jti -> True for tokens revoked by /logout or refresh rotation, kept until they'd expire anyway.
+# Per worker: refresh tokens are also recorded in the shared revoked_tokens
+# table (db/revoked_tokens.sql); a revoked access token stays usable on other
+# workers until it expires (ACCESS_TOKEN_TTL_SECONDS).
+revoked_tokens = LRUCache(maxsize=100_000)
+# employee id -> role, so /token/refresh doesn't re-read `employee` every time
+employee_role_cache = LRUCache(maxsize=10_000, ttl=ROLE_CACHE_TTL_SECONDS)
+
+_JWT_HEADER = base64.urlsafe_b64encode(b'{"alg":"HS256","typ":"JWT"}').rstrip(b"=").decode("ascii")
+
+
+def _b64url_encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64url_decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _jwt_signature(signing_input: str, token_type: str = "access") -> str:
+    mac = hmac.new(TOKEN_SECRETS[token_type].encode("utf-8"), signing_input.encode("ascii"), hashlib.sha256)
+    return _b64url_encode(mac.digest())
+
+
+def issue_token(user_id, role: str | None, token_type: str = "access") -> str:
+    ttl = ACCESS_TOKEN_TTL_SECONDS if token_type == "access" else REFRESH_TOKEN_TTL_SECONDS
+    now = int(time.time())
+    claims = {
+        "id": user_id,
+        "role": role,
+        "type": token_type,
+        "iat": now,
+        "exp": now + ttl,
+        "jti": secrets.token_hex(16),
+    }
+    body = _b64url_encode(json.dumps(claims, separators=(",", ":")).encode("utf-8"))
+    signing_input = f"{_JWT_HEADER}.{body}"
+    return f"{signing_input}.{_jwt_signature(signing_input, token_type)}"
+
+
+def decode_token(token: str, expected_type: str = "access") -> dict:
+    """Verify signature, expiry, type and revocation. Raises 401 on any failure."""
+    try:
+        header_b64, body_b64, signature = token.split(".")
+        header = json.loads(_b64url_decode(header_b64))
+        if header.get("alg") != "HS256":
+            raise ValueError("unexpected alg")
+        if not hmac.compare_digest(_jwt_signature(f"{header_b64}.{body_b64}", expected_type), signature):
+            raise ValueError("bad signature")
+        claims = json.loads(_b64url_decode(body_b64))
+    except Exception:
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+    if claims.get("exp", 0) <= time.time():
+        raise HTTPException(status_code=401, detail="Token expired")
+    if claims.get("type") != expected_type:
+        raise HTTPException(status_code=401, detail="Wrong token type")
+    if claims.get("jti") in revoked_tokens:
+        raise HTTPException(status_code=401, detail="Token revoked")
+    return claims
+
+
+def revoke_token(claims: dict) -> bool:
+    """Revoke a token; False if a refresh token had already been revoked (by any worker)."""
+    remaining = claims.get("exp", 0) - time.time()
+    if remaining <= 0:
+        return True
+    revoked_tokens.set(claims.get("jti"), True, ttl=remaining)
+    if claims.get("type") != "refresh":
+        return True
+    try:
+        # the primary key makes this the single use of the token across workers
+        supabase_auth.table("revoked_tokens").insert({
+            "jti": claims.get("jti"),
+            "expires_at": datetime.utcfromtimestamp(claims["exp"]).isoformat() + "+00:00",
+        }).execute()
+    except Exception as e:
+        if str(getattr(e, "code", "")) == "23505":  # unique_violation
+            return False
+        raise
+    return True
+
+
+def issue_session(user_id, role: str | None) -> dict:
+    return {
+        "token": issue_token(user_id, role, "access"),
+        "refresh_token": issue_token(user_id, role, "refresh"),
+        "token_type": "bearer",
+        "expires_in": ACCESS_TOKEN_TTL_SECONDS,
+    }
+
+
+def bearer_token(authorization: str | None) -> str | None:
+    if authorization and authorization.lower().startswith("bearer "):
+        return authorization.split(" ", 1)[1].strip()
+    return None
+
+
+def get_current_user(authorization: str | None = Header(None)) -> dict:
+    """FastAPI dependency: claims of a valid access token, checked without touching the DB."""
+    token = bearer_token(authorization)
+    if not token:
+        raise HTTPException(status_code=401, detail="Not authorized, no token.")
+    return decode_token(token, "access")
+
+
+def require_roles(*roles: str):
+    """FastAPI dependency factory restricting a route to the given roles (case-insensitive)."""
+    allowed = {r.upper() for r in roles}
+
+    def dependency(user: dict = Depends(get_current_user)) -> dict:
+        if (user.get("role") or "").upper() not in allowed:
+            raise HTTPException(status_code=403, detail="You do not have permission to perform this action.")
+        return user
+
+    return dependency
+
+
+def lookup_employee_role(user_id) -> str | None:
+    role = employee_role_cache.get(user_id)
+    if role is not None:
+        return role
+    res = supabase_auth.table("employee").select("id, role").eq("id", user_id).execute()
+    data = supabase_result_data(res) or []
+    if not data:
+        return None
+    role = data[0].get("role")
+    employee_role_cache.set(user_id, role)
+    return role
+
+# ============================
+# 🚦 Login / Signup Throttling
+# ============================
+class TokenBucketLimiter:
+    """Per-key token buckets. Keys are held in an LRUCache so memory stays bounded."""
+
+    def __init__(self, name: str, capacity: float, refill_per_second: float, max_keys: int = 50_000):
+        self.name = name
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self._buckets = LRUCache(maxsize=max_keys)
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.rejected = 0
+
+    def hit(self, key: str) -> float:
+        """Take one token for `key`. Returns 0 if allowed, else seconds until a token is available."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(key) or (self.capacity, now)
+            tokens = min(self.capacity, tokens + (now - last) * self.refill_per_second)
+            if tokens >= 1:
+                self._buckets.set(key, (tokens - 1, now))
+                self.allowed += 1
+                return 0.0
+            self._buckets.set(key, (tokens, now))
+            self.rejected += 1
+            return (1 - tokens) / self.refill_per_second
+
+    def stats(self) -> dict:
+        return {
+            "capacity": self.capacity,
+            "refill_per_second": self.refill_per_second,
+            "tracked_keys": len(self._buckets),
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+        }
+
+
+# Defaults: 5 attempts per email then 1 every 12s; 30 per IP then 2/s
+login_email_limiter = TokenBucketLimiter(
+    "email",
+    capacity=float(os.environ.get("AUTH_EMAIL_BURST", "5")),
+    refill_per_second=float(os.environ.get("AUTH_EMAIL_PER_MINUTE", "5")) / 60,
+)
+login_ip_limiter = TokenBucketLimiter(
+    "ip",
+    capacity=float(os.environ.get("AUTH_IP_BURST", "30")),
+    refill_per_second=float(os.environ.get("AUTH_IP_PER_MINUTE", "120")) / 60,
+)
+TRUST_FORWARDED_FOR = os.environ.get("TRUST_FORWARDED_FOR", "false").lower() == "true"
+
+
+def client_ip(request: Request) -> str:
+    if TRUST_FORWARDED_FOR:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+def enforce_auth_rate_limit(request: Request, email: str):
+    """Raise 429 before any DB or bcrypt work if this IP or email is over its budget."""
+    retry_after = login_ip_limiter.hit(client_ip(request))
+    if not retry_after:
+        retry_after = login_email_limiter.hit(email.strip().lower())
+    if retry_after:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many attempts, try again later",
+            headers={"Retry-After": str(int(retry_after) + 1)},
+        )
 
 # ============================
 # ❤️ Health Check
@@ -118,9 +561,10 @@ def root():
 # 🧩 SIGNUP Route
 # ============================
 @app.post("/signup")
-def signup_user(data: SignupData):
+def signup_user(data: SignupData, request: Request):
+    enforce_auth_rate_limit(request, data.email)
     try:
-        logger.info(f"🟢 Signup attempt: {data.email}")
+        logger.info("🟢 Signup attempt: %s", data.email)
 
         # Check if user exists
         existing = supabase_auth.table("employee").select("email").eq("email", data.email).execute()
@@ -146,23 +590,175 @@ def signup_user(data: SignupData):
         #     logger.error(f"Supabase signup error: {response.error}")
         #     raise HTTPException(status_code=500, detail=str(response.error))
 
-        logger.info(f"✅ Signup successful for {data.email}")
+        logger.info("✅ Signup successful for %s", data.email)
         return {"success": True, "message": "Signup successful", "data": response.data}
 
     except HTTPException as e:
-        logger.warning(f"⚠️ Signup validation error: {e.detail}")
+        logger.warning("⚠️ Signup validation error: %s", e.detail)
+        raise e
+    except Exception as e:
+        logger.error("💥 Signup Error: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+# ============================
+# 👥 BULK EMPLOYEE IMPORT
+# ============================
+BULK_IMPORT_MAX_ROWS = int(os.environ.get("BULK_IMPORT_MAX_ROWS", "5000"))
+BULK_INSERT_CHUNK_SIZE = 200
+# emails per existence query; the filter goes in the URL, so keep it well under gateway limits
+BULK_EMAIL_LOOKUP_BATCH_SIZE = 100
+# bcrypt releases the GIL while hashing, so a thread pool spreads hashes across cores
+password_hash_pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 4, thread_name_prefix="bcrypt")
+
+
+def hash_password(password: str) -> str:
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+
+
+def parse_bulk_rows(content_type: str, raw: bytes) -> list[dict]:
+    if "csv" in content_type:
+        reader = csv.DictReader(io.StringIO(raw.decode("utf-8-sig")))
+        return [{(k or "").strip(): (v or "").strip() for k, v in row.items()} for row in reader]
+    rows = json.loads(raw.decode("utf-8"))
+    if isinstance(rows, dict):
+        rows = rows.get("users") or rows.get("data") or []
+    if not isinstance(rows, list):
+        raise ValueError("Expected a JSON array of users")
+    return rows
+
+
+def ilike_literal(value: str) -> str:
+    """A PostgREST-quoted ilike pattern matching `value` literally (case-insensitively)."""
+    pattern = value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return '"' + pattern.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def find_existing_emails(emails: list[str]) -> set[str]:
+    """Lowercased emails that already have an employee, matched case-insensitively."""
+    wanted = {e.lower() for e in emails}
+    found: set[str] = set()
+    for start in range(0, len(emails), BULK_EMAIL_LOOKUP_BATCH_SIZE):
+        batch = emails[start:start + BULK_EMAIL_LOOKUP_BATCH_SIZE]
+        res = supabase_auth.table("employee").select("email") \
+            .or_(",".join(f"email.ilike.{ilike_literal(e)}" for e in batch)).execute()
+        # PostgREST treats * as a wildcard too; keep only exact case-insensitive matches
+        found.update(e for e in ((r.get("email") or "").lower() for r in (supabase_result_data(res) or [])) if e in wanted)
+    return found
+
+
+def insert_employee_chunk(chunk: list, hashes: list, created_at: str) -> list[dict]:
+    """Insert one chunk; if the batch is rejected, retry row by row so each row gets its own result."""
+    payload = [
+        {
+            "name": entry.name,
+            "email": entry.email,
+            "password": hashed_pw,
+            "role": entry.role or "EMPLOYEE",
+            "createdAt": created_at,
+            "github_login": entry.githubLogin or None,
+        }
+        for (_, entry), hashed_pw in zip(chunk, hashes)
+    ]
+    try:
+        response = supabase_auth.table("employee").insert(payload).execute()
+        ids = {r.get("email"): r.get("id") for r in (supabase_result_data(response) or [])}
+        return [{"row": i, "email": entry.email, "status": "created", "id": ids.get(entry.email)} for i, entry in chunk]
+    except Exception as e:
+        logger.warning("⚠️ Bulk import chunk of %s rejected, inserting row by row: %s", len(chunk), e)
+
+    results = []
+    for (i, entry), row in zip(chunk, payload):
+        try:
+            response = supabase_auth.table("employee").insert(row).execute()
+            created = supabase_result_data(response) or [{}]
+            results.append({"row": i, "email": entry.email, "status": "created", "id": created[0].get("id")})
+        except Exception as e:
+            # 23505 = unique_violation, e.g. created concurrently since the existence check
+            status = "exists" if str(getattr(e, "code", "")) == "23505" else "error"
+            results.append({"row": i, "email": entry.email, "status": status, "detail": str(e)})
+    return results
+
+
+@app.post("/signup/bulk")
+async def bulk_import_users(request: Request, user: dict = Depends(require_roles("ADMIN"))):
+    """Create many employees from a JSON array or a CSV body (name,email,password,role,githubLogin)"""
+    try:
+        raw = await request.body()
+        try:
+            rows = parse_bulk_rows(request.headers.get("content-type", ""), raw)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Invalid import body: {e}")
+        if len(rows) > BULK_IMPORT_MAX_ROWS:
+            raise HTTPException(status_code=413, detail=f"At most {BULK_IMPORT_MAX_ROWS} rows per import")
+
+        logger.info("🟢 Bulk import of %s users by %s", len(rows), user.get('id'))
+
+        results: list[dict] = []
+        candidates: list[tuple[int, SignupData]] = []
+        seen: set[str] = set()
+        for i, row in enumerate(rows):
+            try:
+                if isinstance(row, dict) and "github_login" in row and "githubLogin" not in row:
+                    row = {**row, "githubLogin": row["github_login"]}
+                entry = SignupData(**{k: v for k, v in row.items() if v != ""})
+            except Exception as e:
+                results.append({"row": i, "email": (row or {}).get("email") if isinstance(row, dict) else None, "status": "invalid", "detail": str(e)})
+                continue
+            email = entry.email.strip().lower()
+            if email in seen:
+                results.append({"row": i, "email": entry.email, "status": "duplicate", "detail": "Email repeated in import"})
+                continue
+            seen.add(email)
+            candidates.append((i, entry))
+
+        # Batched existence queries; supabase calls block, so they run in the threadpool
+        existing_emails: set[str] = set()
+        if candidates:
+            existing_emails = await run_in_threadpool(find_existing_emails, [e.email.strip() for _, e in candidates])
+
+        to_create = []
+        for i, entry in candidates:
+            if entry.email.strip().lower() in existing_emails:
+                results.append({"row": i, "email": entry.email, "status": "exists", "detail": "User already exists"})
+            else:
+                to_create.append((i, entry))
+
+        # Hash in parallel off the event loop
+        loop = asyncio.get_running_loop()
+        hashes = await asyncio.gather(*(
+            loop.run_in_executor(password_hash_pool, hash_password, entry.password) for _, entry in to_create
+        ))
+
+        created_at = datetime.utcnow().isoformat()
+        for start in range(0, len(to_create), BULK_INSERT_CHUNK_SIZE):
+            chunk = to_create[start:start + BULK_INSERT_CHUNK_SIZE]
+            results.extend(await run_in_threadpool(
+                insert_employee_chunk, chunk, hashes[start:start + BULK_INSERT_CHUNK_SIZE], created_at
+            ))
+
+        results.sort(key=lambda r: r["row"])
+        counts: dict[str, int] = {}
+        for r in results:
+            counts[r["status"]] = counts.get(r["status"], 0) + 1
+
+        logger.info("✅ Bulk import finished: %s", counts)
+        return {"success": True, "message": "Import finished", "counts": counts, "results": results}
+
+    except HTTPException as e:
+        logger.warning("⚠️ Bulk import error: %s", e.detail)
         raise e
     except Exception as e:
-        logger.error(f"💥 Signup Error: {e}")
+        logger.error("💥 Bulk Import Error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 # ============================
 # 🔐 LOGIN Route
 # ============================
 @app.post("/login")
-def login_user(data: LoginData):
+def login_user(data: LoginData, request: Request):
+    enforce_auth_rate_limit(request, data.email)
     try:
-        logger.info(f"🟢 Login attempt: {data.email}")
+        logger.info("🟢 Login attempt: %s", data.email)
         result = supabase_auth.table("employee").select("*").eq("email", data.email).execute()
 
         if not result.data:
@@ -177,7 +773,7 @@ def login_user(data: LoginData):
         # Auto-hash old plain-text passwords (optional but good)
         if not stored_password.startswith("$2b$"):
             if stored_password == data.password:
-                logger.info(f"Hashing legacy password for {data.email}")
+                logger.info("Hashing legacy password for %s", data.email)
                 new_hash = bcrypt.hashpw(data.password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
                 supabase_auth.table("employee").update({"password": new_hash}).eq("email", data.email).execute()
                 stored_password = new_hash
@@ -188,25 +784,484 @@ def login_user(data: LoginData):
         if not bcrypt.checkpw(data.password.encode("utf-8"), stored_password.encode("utf-8")):
             raise HTTPException(status_code=401, detail="Invalid credentials")
 
-        logger.info(f"✅ Login successful for: {user['email']}")
+        logger.info("✅ Login successful for: %s", user['email'])
         # Don't send the password hash back to the client
         user.pop("password", None) 
-        return {"success": True, "message": "Login successful", "user": user}
+        employee_role_cache.set(user.get("id"), user.get("role"))
+        return {"success": True, "message": "Login successful", "user": user, **issue_session(user.get("id"), user.get("role"))}
 
     except HTTPException as e:
-        logger.warning(f"⚠️ Login error: {e.detail}")
+        logger.warning("⚠️ Login error: %s", e.detail)
         raise e
     except Exception as e:
-        logger.error(f"💥 Login Error: {e}")
+        logger.error("💥 Login Error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/token/refresh")
+def refresh_session(data: RefreshData):
+    """Exchange a refresh token for a new access/refresh pair (the old refresh token is revoked on every worker)."""
+    try:
+        claims = decode_token(data.refresh_token, "refresh")
+        role = lookup_employee_role(claims.get("id"))
+        if role is None:
+            raise HTTPException(status_code=401, detail="User not found")
+        if not revoke_token(claims):
+            raise HTTPException(status_code=401, detail="Token revoked")
+        return {"success": True, **issue_session(claims.get("id"), role)}
+
+    except HTTPException as e:
+        logger.warning("⚠️ Token refresh error: %s", e.detail)
+        raise e
+    except Exception as e:
+        logger.error("💥 Token Refresh Error: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/logout")
+def logout_user(data: RefreshData | None = None, authorization: str | None = Header(None)):
+    """Revoke the refresh token (on every worker) and the presented access token (on this worker; it expires within ACCESS_TOKEN_TTL_SECONDS)."""
+    for token, token_type in ((bearer_token(authorization), "access"), (data.refresh_token if data else None, "refresh")):
+        if not token:
+            continue
+        try:
+            revoke_token(decode_token(token, token_type))
+        except HTTPException:
+            pass  # already invalid, nothing to revoke
+    return {"success": True, "message": "Logged out"}
+
+@app.get("/auth/rate-limits")
+def get_auth_rate_limits(user: dict = Depends(require_roles("ADMIN"))):
+    """Throttling counters for /login and /signup"""
+    return {
+        "success": True,
+        "data": {
+            "email": login_email_limiter.stats(),
+            "ip": login_ip_limiter.stats(),
+        },
+    }
+
+@app.get("/admin/databases")
+def get_database_health(user: dict = Depends(require_roles("ADMIN"))):
+    """Circuit breaker state and call counters per Supabase project"""
+    return {"success": True, "data": {db.name: db.stats() for db in (auth_db, transcript_db)}}
+
+
+@app.get("/admin/logging")
+def get_logging_stats(user: dict = Depends(require_roles("ADMIN"))):
+    """Sampling counters, log queue depth and records dropped because the queue was full"""
+    return {
+        "success": True,
+        "data": {
+            "queue_depth": log_queue.qsize(),
+            "queue_capacity": LOG_QUEUE_MAX_RECORDS,
+            "queue_dropped": log_queue_handler.dropped,
+            "sampling": {
+                webhook_logger.route: webhook_logger.stats(),
+                list_logger.route: list_logger.stats(),
+            },
+        },
+    }
+
+# ============================
+# 🔥 Sampling Profiler
+# ============================
+# Samples Python stacks at a fixed interval and aggregates them as
+# collapsed stacks ("frame;frame;frame count"), the input format of
+# flamegraph.pl / speedscope. Nothing runs unless a profile is requested.
+# Each uvicorn worker is a separate process. Profiles go through
+# PROFILE_DIR, shared by the workers on the host like the upload dir:
+#   /admin/profile             - every thread of every worker on the host: the
+#                                endpoint drops a <id>.request file, each
+#                                worker's profile-watcher thread samples until
+#                                its deadline and writes <id>.<pid>.json, and
+#                                the endpoint merges them
+#   X-Profile-Request: 1       - only the flagged request's own stacks: its
+#                                coroutine on the event loop and the threadpool
+#                                calls it makes (sync endpoints, run_in_threadpool).
+#                                Work handed to other executors, such as the
+#                                bcrypt pool, is not attributed to it.
+PROFILE_MAX_SECONDS = 60
+PROFILE_DIR = os.environ.get("PROFILE_DIR") or os.path.join(tempfile.gettempdir(), "fosys-profiles")
+PROFILE_POLL_SECONDS = 0.5
+PROFILE_TTL_SECONDS = 3600
+PROFILE_ID_RE = re.compile(r"^[0-9a-f]{16}$")
+os.makedirs(PROFILE_DIR, exist_ok=True)
+# set by RequestProfilerMiddleware; threadpool calls inherit a copy of the request's context
+profiled_request: contextvars.ContextVar = contextvars.ContextVar("profiled_request", default=None)
+
+
+class StackSampler(threading.Thread):
+    def __init__(self, interval: float = 0.01, belongs=None):
+        super().__init__(name="stack-sampler", daemon=True)
+        self.interval = interval
+        self.belongs = belongs  # frame -> bool picking the stacks to keep; None keeps all
+        self.samples = 0
+        self.stacks: dict[str, int] = {}
+        self._stop_event = threading.Event()
+
+    def run(self):
+        own_id = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                if self.belongs is not None and not self.belongs(frame):
+                    continue
+                names = []
+                while frame is not None:
+                    code = frame.f_code
+                    names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack = ";".join(reversed(names))
+                self.stacks[stack] = self.stacks.get(stack, 0) + 1
+            self.samples += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def collapsed(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in sorted(self.stacks.items()))
+
+
+class RequestStacks:
+    """Matches the stacks that are running one request.
+
+    On the event loop the request's coroutine chain runs through the
+    middleware's own frame. A threadpool worker runs a call inside a copy of
+    the caller's context, which its base frames keep as a local; only those
+    few outermost frames are checked.
+    """
+
+    WORKER_BASE_FRAMES = 4
+
+    def __init__(self, marker_frame, token):
+        self.marker_frame = marker_frame
+        self.token = token
+
+    def __call__(self, frame) -> bool:
+        chain = []
+        while frame is not None:
+            if frame is self.marker_frame:
+                return True
+            chain.append(frame)
+            frame = frame.f_back
+        for base in chain[-self.WORKER_BASE_FRAMES:]:
+            for value in base.f_locals.values():
+                if isinstance(value, contextvars.Context) and value.get(profiled_request) is self.token:
+                    return True
+        return False
+
+
+# one profile at a time per worker, host-wide or flagged
+profile_lock = threading.Lock()
+
+
+def write_profile_file(name: str, content: str):
+    """Write a file into PROFILE_DIR atomically, so readers never see half of it."""
+    path = os.path.join(PROFILE_DIR, name)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(path + ".tmp", path)
+
+
+def remove_profile_files(prefix: str):
+    for name in os.listdir(PROFILE_DIR):
+        if name.startswith(prefix):
+            try:
+                os.remove(os.path.join(PROFILE_DIR, name))
+            except FileNotFoundError:
+                pass
+
+
+def sample_worker(profile_id: str, until: float, interval: float):
+    """Sample every thread of this worker until `until` and leave the stacks in PROFILE_DIR."""
+    if not profile_lock.acquire(blocking=False):
+        return  # busy with a flagged request; this worker is missing from the merged profile
+    try:
+        sampler = StackSampler(interval=interval)
+        sampler.start()
+        try:
+            time.sleep(max(until - time.time(), 0))
+        finally:
+            sampler.stop()
+    finally:
+        profile_lock.release()
+    write_profile_file(
+        f"{profile_id}.{os.getpid()}.json",
+        json.dumps({"worker": os.getpid(), "samples": sampler.samples, "stacks": sampler.stacks}),
+    )
+
+
+class ProfileWatcher(threading.Thread):
+    """Picks up host-wide profile requests from PROFILE_DIR and runs them in this worker."""
+
+    def __init__(self):
+        super().__init__(name="profile-watcher", daemon=True)
+        self.started_ids: set = set()
+
+    def run(self):
+        while True:
+            time.sleep(PROFILE_POLL_SECONDS)
+            try:
+                self.poll()
+            except Exception as e:
+                logger.error("💥 Profile watcher error: %s", e)
+
+    def poll(self):
+        requested = set()
+        cutoff = time.time() - PROFILE_TTL_SECONDS
+        for name in os.listdir(PROFILE_DIR):
+            path = os.path.join(PROFILE_DIR, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)  # left behind by a crashed worker or an unread flagged profile
+                    continue
+            except OSError:
+                continue
+            if name.endswith(".request"):
+                requested.add(name[: -len(".request")])
+        for profile_id in requested - self.started_ids:
+            try:
+                with open(os.path.join(PROFILE_DIR, profile_id + ".request"), "r", encoding="utf-8") as f:
+                    spec = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if spec["until"] > time.time():
+                threading.Thread(
+                    target=sample_worker, args=(profile_id, spec["until"], spec["interval"]),
+                    name="stack-sampler-" + profile_id, daemon=True,
+                ).start()
+        self.started_ids = requested
+
+
+@app.on_event("startup")
+def start_profile_watcher():
+    ProfileWatcher().start()
+
+
+def merge_worker_profiles(profile_id: str, by_worker: bool):
+    """(collapsed stacks, total samples, worker pids) from every worker's result file."""
+    stacks: dict[str, int] = {}
+    samples, workers = 0, []
+    for name in sorted(os.listdir(PROFILE_DIR)):
+        if not (name.startswith(profile_id + ".") and name.endswith(".json")):
+            continue
+        try:
+            with open(os.path.join(PROFILE_DIR, name), "r", encoding="utf-8") as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            continue
+        workers.append(str(result["worker"]))
+        samples += result["samples"]
+        for stack, count in result["stacks"].items():
+            if by_worker:
+                stack = f"worker {result['worker']};{stack}"
+            stacks[stack] = stacks.get(stack, 0) + count
+    collapsed = "\n".join(f"{stack} {count}" for stack, count in sorted(stacks.items()))
+    return collapsed, samples, workers
+
+
+class RequestProfilerMiddleware:
+    """Profiles a request sent with `X-Profile-Request: 1` by an admin.
+
+    Only the request's own stacks are kept (see RequestStacks). The result
+    is stored in PROFILE_DIR under the id returned in the `X-Profile-Id`
+    response header, so any worker can serve it; `X-Profile-Worker` names
+    the worker that ran the request. Other requests only pay for one
+    header scan.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        headers = dict(scope.get("headers") or [])
+        if headers.get(b"x-profile-request") != b"1" or not self._is_admin(headers):
+            return await self.app(scope, receive, send)
+        if not profile_lock.acquire(blocking=False):
+            return await self.app(scope, receive, send)
+
+        profile_id = secrets.token_hex(8)
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", []).extend([
+                    (b"x-profile-id", profile_id.encode("ascii")),
+                    (b"x-profile-worker", str(os.getpid()).encode("ascii")),
+                ])
+            await send(message)
+
+        token = object()
+        context_token = profiled_request.set(token)
+        sampler = StackSampler(interval=0.005, belongs=RequestStacks(sys._getframe(), token))
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            sampler.stop()
+            profiled_request.reset(context_token)
+            profile_lock.release()
+            write_profile_file(f"flagged-{profile_id}.collapsed", sampler.collapsed())
+
+    @staticmethod
+    def _is_admin(headers: dict) -> bool:
+        token = bearer_token((headers.get(b"authorization") or b"").decode("latin-1"))
+        if not token:
+            return False
+        try:
+            return (decode_token(token, "access").get("role") or "").upper() == "ADMIN"
+        except HTTPException:
+            return False
+
+
+app.add_middleware(RequestProfilerMiddleware)
+
+
+@app.get("/admin/profile")
+async def profile_server(
+    seconds: float = 10,
+    interval_ms: float = 10,
+    by_worker: bool = False,
+    user: dict = Depends(require_roles("ADMIN")),
+):
+    """Sample all threads of every worker on this host for `seconds` and return merged collapsed stacks.
+
+    `by_worker` roots each stack at its worker's pid instead of summing workers together.
+    """
+    seconds = min(max(seconds, 0.1), PROFILE_MAX_SECONDS)
+    now = time.time()
+    for name in os.listdir(PROFILE_DIR):
+        if name.endswith(".request"):
+            try:
+                with open(os.path.join(PROFILE_DIR, name), "r", encoding="utf-8") as f:
+                    if json.load(f)["until"] > now:
+                        raise HTTPException(status_code=409, detail="A profile is already running")
+            except (OSError, ValueError):
+                continue
+
+    profile_id = secrets.token_hex(8)
+    logger.info("🔥 Profiling %s for %ss at %sms requested by %s", profile_id, seconds, interval_ms, user.get("id"))
+    # watchers pick the request up within PROFILE_POLL_SECONDS; the shared deadline keeps their windows aligned
+    until = now + PROFILE_POLL_SECONDS + seconds
+    write_profile_file(profile_id + ".request", json.dumps({"until": until, "interval": max(interval_ms, 1) / 1000}))
+    try:
+        await asyncio.sleep(until - time.time() + 2 * PROFILE_POLL_SECONDS)
+        collapsed, samples, workers = merge_worker_profiles(profile_id, by_worker)
+    finally:
+        remove_profile_files(profile_id + ".")
+    return PlainTextResponse(collapsed, headers={"X-Profile-Samples": str(samples), "X-Profile-Workers": ",".join(workers)})
+
+
+@app.get("/admin/profile/requests/{profile_id}")
+def get_request_profile(profile_id: str, user: dict = Depends(require_roles("ADMIN"))):
+    """Collapsed stacks captured for a flagged request"""
+    if not PROFILE_ID_RE.match(profile_id):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    try:
+        with open(os.path.join(PROFILE_DIR, f"flagged-{profile_id}.collapsed"), "r", encoding="utf-8") as f:
+            return PlainTextResponse(f.read())
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Profile not found")
+
+# ============================
+# 🧬 TRANSCRIPT DEDUPLICATION
+# ============================
+# The recorder sometimes re-posts a meeting. Uploads are fingerprinted
+# (see dedup.py) and checked against an in-memory index built at startup
+# from the fingerprints stored in transcripts.fingerprint. on_duplicate / TRANSCRIPT_DUPLICATE_POLICY:
+#   merge  - don't insert; copy any summary/tasks/pending_tasks onto the existing row
+#   reject - 409
+#   allow  - insert anyway
+TRANSCRIPT_DUPLICATE_POLICY = os.environ.get("TRANSCRIPT_DUPLICATE_POLICY", "merge").lower()
+transcript_index = TranscriptIndex(similarity_threshold=float(os.environ.get("TRANSCRIPT_NEAR_DUP_THRESHOLD", "0.8")))
+
+
+def rebuild_transcript_index():
+    """Load every stored fingerprint into the index, fingerprinting rows saved before the column existed."""
+    started = time.perf_counter()
+    try:
+        missing = []
+        for page in iter_table_pages(supabase_transcript, "transcripts", "id, project_id, fingerprint"):
+            for row in page:
+                if row.get("fingerprint"):
+                    transcript_index.add(row.get("id"), Fingerprint.from_text(row["fingerprint"]), row.get("project_id"))
+                else:
+                    missing.append(row.get("id"))
+        # one-off backfill: these are read and fingerprinted once, then stored like new uploads
+        for start in range(0, len(missing), 50):
+            rows = (
+                supabase_transcript.table("transcripts")
+                .select("id, transcript, project_id")
+                .in_("id", missing[start:start + 50])
+                .execute()
+                .data
+                or []
+            )
+            for row in rows:
+                fp = fingerprint(row.get("transcript") or "")
+                supabase_transcript.table("transcripts").update({"fingerprint": fp.to_text()}).eq("id", row.get("id")).execute()
+                transcript_index.add(row.get("id"), fp, row.get("project_id"))
+        logger.info(
+            "Transcript index built: %s transcripts (%s backfilled) in %.1fs",
+            len(transcript_index), len(missing), time.perf_counter() - started,
+        )
+    except Exception as e:
+        logger.error("💥 Transcript index build failed: %s", e)
+
+
+@app.on_event("startup")
+def start_transcript_index_build():
+    # built in the background so startup isn't blocked; uploads meanwhile check what's indexed so far
+    threading.Thread(target=rebuild_transcript_index, name="transcript-index", daemon=True).start()
+
+
+def save_transcript(payload: dict, on_duplicate: str | None, fp=None) -> dict:
+    """Insert a transcript unless it duplicates an indexed one. Returns the route's response body."""
+    policy = (on_duplicate or TRANSCRIPT_DUPLICATE_POLICY).lower()
+    if policy not in ("merge", "reject", "allow"):
+        raise HTTPException(status_code=400, detail="on_duplicate must be merge, reject or allow")
+
+    fp = fp or fingerprint(payload["transcript"])
+    # duplicates are only looked for in the same project, so an upload always lands in its own project
+    project_id = payload.get("project_id")
+    match = transcript_index.find_duplicate(fp, project_id) if policy != "allow" else None
+    if match is not None:
+        duplicate_of, similarity = match
+        if policy == "reject":
+            raise HTTPException(status_code=409, detail=f"Duplicate of transcript {duplicate_of} (similarity {similarity})")
+        updates = {k: payload[k] for k in ("summary", "tasks", "pending_tasks") if payload.get(k)}
+        rows = []
+        if updates:
+            rows = supabase_transcript.table("transcripts").update(updates).eq("id", duplicate_of).execute().data or []
+            invalidate_project_cache("transcripts", rows)
+        logger.info("♻️ Duplicate of transcript %s (similarity %s) merged: %s", duplicate_of, similarity, payload["meeting_name"])
+        return {
+            "success": True,
+            "message": "Duplicate transcript merged",
+            "duplicate_of": duplicate_of,
+            "similarity": similarity,
+            "data": [{k: v for k, v in row.items() if k not in ("transcript", "fingerprint")} for row in rows],
+        }
+
+    # stored so the index can be rebuilt without re-reading every transcript
+    response = supabase_transcript.table("transcripts").insert({**payload, "fingerprint": fp.to_text()}).execute()
+    for row in response.data or []:
+        transcript_index.add(row.get("id"), fp, project_id)
+    invalidate_project_cache("transcripts", response.data)
+    rows = [{k: v for k, v in row.items() if k != "fingerprint"} for row in response.data or []]
+    return {"success": True, "message": "Transcript saved successfully!", "data": rows}
+
+
 # ============================
 # 🧾 MEETING TRANSCRIPTS (From 2nd Supabase)
 # ============================
 @app.post("/meeting-transcript")
-def upload_transcript(data: TranscriptData):
+def upload_transcript(data: TranscriptData, on_duplicate: str | None = None):
     try:
-        logger.info(f"📝 Uploading meeting transcript: {data.meeting_name}")
+        logger.info("📝 Uploading meeting transcript: %s", data.meeting_name)
 
         payload = {
             "meeting_name": data.meeting_name,
@@ -216,24 +1271,29 @@ def upload_transcript(data: TranscriptData):
             "pending_tasks": data.pending_tasks or "",
             "created_at": datetime.utcnow().isoformat(),
         }
+        if data.project_id is not None:
+            payload["project_id"] = data.project_id
 
-        response = supabase_transcript.table("transcripts").insert(payload).execute()
+        result = save_transcript(payload, on_duplicate)
         
         # if response.error:  <-- REMOVED THIS BLOCK
         #     logger.error(f"Supabase transcript insert error: {response.error}")
         #     raise HTTPException(status_code=500, detail=str(response.error))
 
-        logger.info(f"✅ Transcript inserted successfully: {data.meeting_name}")
-        return {"success": True, "message": "Transcript saved successfully!", "data": response.data}
+        logger.info("✅ Transcript processed successfully: %s", data.meeting_name)
+        return result
 
+    except HTTPException as e:
+        logger.warning("⚠️ Upload transcript error: %s", e.detail)
+        raise e
     except Exception as e:
-        logger.error(f"💥 Upload Transcript Error: {e}")
+        logger.error("💥 Upload Transcript Error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/meeting-transcript")
 def get_all_transcripts():
     try:
-        logger.info("Fetching all transcripts")
+        list_logger.info("Fetching all transcripts")
         response = (
             supabase_transcript.table("transcripts")
             .select("id, meeting_name, transcript, summary, tasks, pending_tasks, created_at")
@@ -245,17 +1305,17 @@ def get_all_transcripts():
         #     logger.error(f"Supabase transcript fetch error: {response.error}")
         #     raise HTTPException(status_code=500, detail=str(response.error))
         
-        logger.info(f"Found {len(response.data)} transcripts.")
+        list_logger.info("Found %s transcripts.", len(response.data))
         return {"success": True, "data": response.data or []}
 
     except Exception as e:
-        logger.error(f"💥 Fetch Transcript Error: {e}")
+        list_logger.error("💥 Fetch Transcript Error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/meeting-summary")
 def get_meeting_summary():
     try:
-        logger.info("Fetching meeting summaries")
+        list_logger.info("Fetching meeting summaries")
         response = (
             supabase_transcript.table("transcripts")
             .select("id, meeting_name, summary, tasks, pending_tasks, created_at")
@@ -268,12 +1328,288 @@ def get_meeting_summary():
         #     logger.error(f"Supabase summary fetch error: {response.error}")
         #     raise HTTPException(status_code=500, detail=str(response.error))
         
-        logger.info(f"Found {len(response.data)} summaries.")
+        list_logger.info("Found %s summaries.", len(response.data))
         return {"success": True, "data": response.data or []}
 
     except Exception as e:
-        logger.error(f"💥 Meeting Summary Error: {e}")
+        list_logger.error("💥 Meeting Summary Error: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+# ============================
+# 📤 CHUNKED TRANSCRIPT UPLOADS
+# ============================
+# Large transcripts are streamed to a temp file in pieces instead of being
+# sent as one JSON body:
+#   POST /meeting-transcript/uploads                      -> upload_id
+#   PUT  /meeting-transcript/uploads/{id}?offset=N  (raw bytes, repeat)
+#   GET  /meeting-transcript/uploads/{id}                 -> current offset, to resume
+#   POST /meeting-transcript/uploads/{id}/complete        -> inserts the transcript
+# Upload state lives next to the data file, so any worker on the host can resume it.
+# Writers hold an flock on the data file, so two PUTs (or a PUT and
+# complete) on one upload can't interleave, whichever worker serves them.
+TRANSCRIPT_UPLOAD_DIR = os.environ.get("TRANSCRIPT_UPLOAD_DIR") or os.path.join(tempfile.gettempdir(), "fosys-transcript-uploads")
+TRANSCRIPT_UPLOAD_MAX_BYTES = int(os.environ.get("TRANSCRIPT_UPLOAD_MAX_BYTES", str(200 * 1024 * 1024)))
+TRANSCRIPT_UPLOAD_TTL_SECONDS = 24 * 3600
+TRANSCRIPT_READ_BLOCK_BYTES = 1024 * 1024
+UPLOAD_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+os.makedirs(TRANSCRIPT_UPLOAD_DIR, exist_ok=True)
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines: uploads are then only serialized within one worker
+    fcntl = None
+local_upload_locks: set = set()
+local_upload_locks_guard = threading.Lock()
+
+
+def upload_paths(upload_id: str):
+    if not UPLOAD_ID_RE.match(upload_id):
+        raise HTTPException(status_code=404, detail="Upload not found")
+    base = os.path.join(TRANSCRIPT_UPLOAD_DIR, upload_id)
+    meta_path, data_path = base + ".json", base + ".part"
+    if not os.path.exists(meta_path):
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return meta_path, data_path
+
+
+def load_upload_meta(meta_path: str) -> dict:
+    with open(meta_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def remove_upload(upload_id: str):
+    for ext in (".json", ".part"):
+        try:
+            os.remove(os.path.join(TRANSCRIPT_UPLOAD_DIR, upload_id + ext))
+        except FileNotFoundError:
+            pass
+
+
+def purge_stale_uploads():
+    """Remove uploads with no activity for TRANSCRIPT_UPLOAD_TTL_SECONDS.
+
+    Every PUT appends to the .part file, so the newer of the two mtimes is
+    the last activity; both files go together.
+    """
+    cutoff = time.time() - TRANSCRIPT_UPLOAD_TTL_SECONDS
+    last_activity: dict = {}
+    for name in os.listdir(TRANSCRIPT_UPLOAD_DIR):
+        upload_id = os.path.splitext(name)[0]
+        try:
+            mtime = os.path.getmtime(os.path.join(TRANSCRIPT_UPLOAD_DIR, name))
+        except OSError:
+            continue
+        last_activity[upload_id] = max(mtime, last_activity.get(upload_id, 0))
+    for upload_id, mtime in last_activity.items():
+        if mtime < cutoff:
+            remove_upload(upload_id)
+
+
+@contextmanager
+def locked_upload(data_path: str):
+    """The upload's data file opened for append, held exclusively; 409 if another request holds it."""
+    f = open(data_path, "ab")
+    try:
+        if fcntl is not None:
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise HTTPException(status_code=409, detail="Upload is busy with another request, retry")
+        else:
+            with local_upload_locks_guard:
+                if data_path in local_upload_locks:
+                    raise HTTPException(status_code=409, detail="Upload is busy with another request, retry")
+                local_upload_locks.add(data_path)
+        try:
+            yield f
+        finally:
+            if fcntl is None:
+                with local_upload_locks_guard:
+                    local_upload_locks.discard(data_path)
+    finally:
+        f.close()  # also releases the flock
+
+
+def read_upload_text(data_path: str):
+    """(transcript, fingerprint) of an upload, decoded and fingerprinted block by block."""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    parts: list[str] = []
+
+    def pieces():
+        with open(data_path, "rb") as f:
+            while True:
+                block = f.read(TRANSCRIPT_READ_BLOCK_BYTES)
+                text = decoder.decode(block, final=not block)
+                if text:
+                    parts.append(text)
+                    yield text
+                if not block:
+                    return
+
+    try:
+        fp = fingerprint_stream(pieces())
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Transcript is not valid UTF-8")
+    transcript = "".join(parts)
+    parts.clear()
+    return transcript, fp
+
+
+@app.post("/meeting-transcript/uploads")
+def start_transcript_upload(data: TranscriptUploadStart):
+    """Open a resumable upload for a large transcript"""
+    try:
+        if data.total_size is not None and data.total_size > TRANSCRIPT_UPLOAD_MAX_BYTES:
+            raise HTTPException(status_code=413, detail="Transcript too large")
+        purge_stale_uploads()
+
+        upload_id = secrets.token_hex(16)
+        base = os.path.join(TRANSCRIPT_UPLOAD_DIR, upload_id)
+        open(base + ".part", "wb").close()
+        with open(base + ".json", "w", encoding="utf-8") as f:
+            json.dump({
+                "meeting_name": data.meeting_name,
+                "total_size": data.total_size,
+                "project_id": data.project_id,
+                "created_at": datetime.utcnow().isoformat(),
+            }, f)
+
+        logger.info("📝 Started transcript upload %s: %s", upload_id, data.meeting_name)
+        return {"success": True, "upload_id": upload_id, "offset": 0}
+
+    except HTTPException as e:
+        logger.warning("⚠️ Transcript upload error: %s", e.detail)
+        raise e
+    except Exception as e:
+        logger.error("💥 Start Transcript Upload Error: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/meeting-transcript/uploads/{upload_id}")
+def get_transcript_upload(upload_id: str):
+    """Bytes received so far; resume with PUT at this offset"""
+    meta_path, data_path = upload_paths(upload_id)
+    meta = load_upload_meta(meta_path)
+    return {"success": True, "upload_id": upload_id, "offset": os.path.getsize(data_path), "total_size": meta.get("total_size")}
+
+
+@app.put("/meeting-transcript/uploads/{upload_id}")
+async def append_transcript_chunk(upload_id: str, request: Request, offset: int = 0):
+    """Append the raw request body to the upload, streamed straight to disk"""
+    meta_path, data_path = upload_paths(upload_id)
+    with locked_upload(data_path) as f:
+        # re-read under the lock: a concurrent PUT at the same offset has either finished or gets a 409
+        current = os.fstat(f.fileno()).st_size
+        if offset != current:
+            raise HTTPException(status_code=409, detail=f"Offset mismatch, expected {current}")
+
+        written = current
+        try:
+            async for chunk in request.stream():
+                written += len(chunk)
+                if written > TRANSCRIPT_UPLOAD_MAX_BYTES:
+                    raise HTTPException(status_code=413, detail="Transcript too large")
+                # disk writes go to the threadpool so a slow disk can't stall the event loop
+                await run_in_threadpool(f.write, chunk)
+            await run_in_threadpool(f.flush)
+        except HTTPException:
+            # drop the partial chunk so the client can retry from `offset`
+            await run_in_threadpool(f.truncate, current)
+            raise
+
+    return {"success": True, "upload_id": upload_id, "offset": written}
+
+
+@app.post("/meeting-transcript/uploads/{upload_id}/complete")
+def complete_transcript_upload(upload_id: str, data: TranscriptDetails | None = None, on_duplicate: str | None = None):
+    """Assemble the uploaded chunks and save the transcript"""
+    meta_path, data_path = upload_paths(upload_id)
+    try:
+        with locked_upload(data_path) as f:
+            meta = load_upload_meta(meta_path)
+            size = os.fstat(f.fileno()).st_size
+            if meta.get("total_size") is not None and size != meta["total_size"]:
+                raise HTTPException(status_code=409, detail=f"Upload incomplete: {size}/{meta['total_size']} bytes")
+            transcript, fp = read_upload_text(data_path)
+
+        details = data or TranscriptDetails()
+        payload = {
+            "meeting_name": meta.get("meeting_name"),
+            "transcript": transcript,
+            "summary": details.summary or "",
+            "tasks": details.tasks or "",
+            "pending_tasks": details.pending_tasks or "",
+            "created_at": datetime.utcnow().isoformat(),
+        }
+        if meta.get("project_id") is not None:
+            payload["project_id"] = meta["project_id"]
+        del transcript  # payload holds the only reference now
+        result = save_transcript(payload, on_duplicate, fp)
+        del payload
+        remove_upload(upload_id)
+
+        logger.info("✅ Transcript upload %s processed (%s bytes)", upload_id, size)
+        result["data"] = [{k: v for k, v in row.items() if k != "transcript"} for row in (result.get("data") or [])]
+        return result
+
+    except HTTPException as e:
+        logger.warning("⚠️ Transcript upload error: %s", e.detail)
+        raise e
+    except Exception as e:
+        logger.error("💥 Complete Transcript Upload Error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/meeting-transcript/{transcript_id}")
+def get_transcript(transcript_id: str):
+    """Fetch one meeting transcript, including its text"""
+    try:
+        response = (
+            supabase_transcript.table("transcripts")
+            .select("id, meeting_name, transcript, summary, tasks, pending_tasks, created_at, project_id")
+            .eq("id", transcript_id)
+            .execute()
+        )
+        if not response.data:
+            raise HTTPException(status_code=404, detail="Transcript not found")
+        return {"success": True, "data": response.data[0]}
+
+    except HTTPException as e:
+        list_logger.warning("⚠️ Fetch Transcript error: %s", e.detail)
+        raise e
+    except Exception as e:
+        list_logger.error("💥 Fetch Transcript Error: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.patch("/meeting-transcript/{transcript_id}")
+def attach_transcript_details(transcript_id: str, data: TranscriptDetails):
+    """Attach summary / tasks / pending_tasks to a saved transcript"""
+    try:
+        updates = {k: v for k, v in data.dict().items() if v is not None}
+        if not updates:
+            raise HTTPException(status_code=400, detail="Nothing to update")
+        response = (
+            supabase_transcript.table("transcripts")
+            .update(updates)
+            .eq("id", transcript_id)
+            .execute()
+        )
+        if not response.data:
+            raise HTTPException(status_code=404, detail="Transcript not found")
+        invalidate_project_cache("transcripts", response.data)
+
+        logger.info("✅ Transcript %s details updated", transcript_id)
+        rows = [{k: v for k, v in row.items() if k not in ("transcript", "fingerprint")} for row in response.data]
+        return {"success": True, "message": "Transcript updated", "data": rows}
+
+    except HTTPException as e:
+        logger.warning("⚠️ Transcript update error: %s", e.detail)
+        raise e
+    except Exception as e:
+        logger.error("💥 Update Transcript Error: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
     # ============================
 # ✅ TASK MANAGEMENT (Two-way sync with Supabase)
 # ============================
@@ -284,13 +1620,14 @@ class TaskData(BaseModel):
     status: str | None = "Pending"
     assigned_to: str | None = None
     due_date: str | None = None
+    project_id: int | None = None
 
 
 @app.post("/tasks")
 def create_task(data: TaskData):
     """Add a new task"""
     try:
-        logger.info(f"🟢 Creating task: {data.title}")
+        logger.info("🟢 Creating task: %s", data.title)
 
         payload = {
             "title": data.title,
@@ -300,14 +1637,18 @@ def create_task(data: TaskData):
             "due_date": data.due_date,
             "created_at": datetime.utcnow().isoformat(),
         }
+        if data.project_id is not None:
+            payload["project_id"] = data.project_id
 
         response = supabase_transcript.table("tasks").insert(payload).execute()
+        record_analytics(team_analytics.upsert_tasks, response.data)
+        invalidate_project_cache("tasks", response.data)
 
-        logger.info(f"✅ Task created successfully: {data.title}")
+        logger.info("✅ Task created successfully: %s", data.title)
         return {"success": True, "message": "Task created successfully", "data": response.data}
 
     except Exception as e:
-        logger.error(f"💥 Create Task Error: {e}")
+        logger.error("💥 Create Task Error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -315,7 +1656,7 @@ def create_task(data: TaskData):
 def get_all_tasks():
     """Fetch all tasks"""
     try:
-        logger.info("📋 Fetching all tasks...")
+        list_logger.info("📋 Fetching all tasks...")
         response = (
             supabase_transcript.table("tasks")
             .select("id, title, description, status, assigned_to, due_date, created_at")
@@ -323,11 +1664,11 @@ def get_all_tasks():
             .execute()
         )
 
-        logger.info(f"✅ Retrieved {len(response.data)} tasks.")
+        list_logger.info("✅ Retrieved %s tasks.", len(response.data))
         return {"success": True, "data": response.data or []}
 
     except Exception as e:
-        logger.error(f"💥 Fetch Tasks Error: {e}")
+        list_logger.error("💥 Fetch Tasks Error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -335,18 +1676,107 @@ def get_all_tasks():
 def update_task(task_id: str, data: TaskData):
     """Update task (status, description, or due date)"""
     try:
-        logger.info(f"✏️ Updating task ID: {task_id}")
+        logger.info("✏️ Updating task ID: %s", task_id)
 
         updates = {k: v for k, v in data.dict().items() if v is not None}
+        previous = []
+        if "project_id" in updates:
+            # a task moving between projects must also leave the old project's cached list
+            previous = supabase_transcript.table("tasks").select("project_id").eq("id", task_id).execute().data or []
         response = supabase_transcript.table("tasks").update(updates).eq("id", task_id).execute()
+        record_analytics(team_analytics.upsert_tasks, response.data)
+        invalidate_project_cache("tasks", (response.data or []) + previous)
 
-        logger.info(f"✅ Task {task_id} updated successfully.")
+        logger.info("✅ Task %s updated successfully.", task_id)
         return {"success": True, "message": "Task updated", "data": response.data}
 
     except Exception as e:
-        logger.error(f"💥 Update Task Error: {e}")
+        logger.error("💥 Update Task Error: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+# ============================
+# 🗂️ PROJECT-SCOPED TASKS & TRANSCRIPTS
+# ============================
+# Reads filter on project_id in the query (indexed, see
+# db/project_partitioning.sql), so cost follows project size. Results are
+# cached per (kind, project) and dropped whenever a write touches that project.
+# The cache is per worker: a write only drops the entry in the worker that
+# handled it, so other workers can serve the old listing for up to
+# PROJECT_CACHE_TTL_SECONDS. Transcript listings leave out the transcript
+# text (fetch it from GET /meeting-transcript/{id}) to keep entries small.
+PROJECT_CACHE_TTL_SECONDS = int(os.environ.get("PROJECT_CACHE_TTL_SECONDS", "30"))
+project_cache = LRUCache(maxsize=512, ttl=PROJECT_CACHE_TTL_SECONDS)
+
+
+def invalidate_project_cache(kind: str, rows):
+    for row in rows or []:
+        if row.get("project_id") is not None:
+            project_cache.pop((kind, row["project_id"]))
+
+
+@app.get("/projects/{project_id}/tasks")
+def get_project_tasks(project_id: int):
+    """Fetch one project's tasks"""
+    try:
+        cached = project_cache.get(("tasks", project_id))
+        if cached is not None:
+            return {"success": True, "data": cached}
+
+        response = (
+            supabase_transcript.table("tasks")
+            .select("id, title, description, status, assigned_to, due_date, created_at, project_id")
+            .eq("project_id", project_id)
+            .order("created_at", desc=True)
+            .execute()
+        )
+        data = response.data or []
+        project_cache.set(("tasks", project_id), data)
+
+        list_logger.info("✅ Retrieved %s tasks for project %s.", len(data), project_id)
+        return {"success": True, "data": data}
+
+    except Exception as e:
+        list_logger.error("💥 Fetch Project Tasks Error: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/projects/{project_id}/tasks")
+def create_project_task(project_id: int, data: TaskData):
+    """Add a task to a project"""
+    return create_task(data.copy(update={"project_id": project_id}))
+
+
+@app.get("/projects/{project_id}/meeting-transcript")
+def get_project_transcripts(project_id: int):
+    """Fetch one project's meeting transcripts, without their text"""
+    try:
+        cached = project_cache.get(("transcripts", project_id))
+        if cached is not None:
+            return {"success": True, "data": cached}
+
+        response = (
+            supabase_transcript.table("transcripts")
+            .select("id, meeting_name, summary, tasks, pending_tasks, created_at, project_id")
+            .eq("project_id", project_id)
+            .order("created_at", desc=True)
+            .execute()
+        )
+        data = response.data or []
+        project_cache.set(("transcripts", project_id), data)
+
+        list_logger.info("Found %s transcripts for project %s.", len(data), project_id)
+        return {"success": True, "data": data}
+
+    except Exception as e:
+        list_logger.error("💥 Fetch Project Transcripts Error: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
+
+@app.post("/projects/{project_id}/meeting-transcript")
+def upload_project_transcript(project_id: int, data: TranscriptData, on_duplicate: str | None = None):
+    """Save a meeting transcript under a project"""
+    return upload_transcript(data.copy(update={"project_id": project_id}), on_duplicate)
+
 def verify_github_signature(raw_body: bytes, signature_header: str, secret: str) -> bool:
     """
     signature_header example: "sha256=abcd..."
@@ -383,6 +1813,693 @@ def supabase_result_data(res):
     except Exception:
         return None
 
+def repo_coords(repo: dict):
+    """Return (repo_owner, repo_name) from a webhook `repository` object."""
+    full_name = repo.get("full_name") or ""
+    owner_part, _, name_part = full_name.partition("/")
+    repo_owner = (repo.get("owner") or {}).get("login") or owner_part
+    repo_name = repo.get("name") or name_part or None
+    return repo_owner, repo_name
+
+# helper to resolve employee id by github login or fallback to parsed emp gh
+def resolve_author_id(sender_login: str | None, emp_gh_fallback: str | None):
+    try:
+        for login in (sender_login, emp_gh_fallback):
+            if not login:
+                continue
+            res = supabase_auth.table("employee").select("id").eq("github_login", login).execute()
+            data = supabase_result_data(res)
+            if data:
+                # data is usually a list
+                if isinstance(data, list) and len(data) > 0:
+                    return data[0].get("id")
+                if isinstance(data, dict):
+                    return data.get("id")
+    except Exception as e:
+        webhook_logger.warning("Error resolving employee: %s", e)
+    return None
+
+
+# ============================
+# 📊 PR / CI Rollups
+# ============================
+def iter_table_pages(client: Client, table: str, columns: str, page_size: int = 1000):
+    """Yield a table's rows page by page (PostgREST caps a single select at 1000 rows)."""
+    start = 0
+    while True:
+        res = client.table(table).select(columns).order("id").range(start, start + page_size - 1).execute()
+        page = supabase_result_data(res) or []
+        if page:
+            yield page
+        if len(page) < page_size:
+            return
+        start += page_size
+
+
+PR_ROLLUP_COLUMNS = "id, url, pr_html_url, status, taskid_raw, \"authorId\", \"createdAt\", ci_overall, head_sha, last_updated_at, repo_owner, repo_name, pr_number"
+PR_ROLLUP_RESYNC_SECONDS = int(os.environ.get("PR_ROLLUP_RESYNC_SECONDS", "300"))
+
+
+def empty_pr_counts() -> dict:
+    return {"total": 0, "open": 0, "merged": 0, "closed": 0, "ci_passing": 0, "ci_failing": 0, "ci_pending": 0}
+
+
+def pr_repo_key(row: dict) -> str:
+    return f"{row.get('repo_owner')}/{row.get('repo_name')}"
+
+
+class PRIndex:
+    """PR rows with per-employee / per-repo counters and newest-first listings.
+
+    `ordered` keeps, for every list filter value, the matching PR ids sorted
+    by (last_updated_at, id), so a page of /prs is a slice instead of a sort.
+    """
+
+    def __init__(self):
+        self.rows: dict = {}
+        self.by_head: dict = {}  # (owner, repo, head_sha) -> {pr ids}
+        # None (all PRs) | ("author", id) | ("repo", "owner/name") | ("status", s) -> [(last_updated_at, id)]
+        self.ordered: dict = {}
+        self.totals = empty_pr_counts()
+        self.employee_counts: dict = {}
+        self.repo_counts: dict = {}
+
+    @staticmethod
+    def _listing_keys(row: dict) -> tuple:
+        return None, ("author", row.get("authorId")), ("repo", pr_repo_key(row)), ("status", row.get("status") or "open")
+
+    def _apply(self, row: dict, sign: int):
+        buckets = [
+            self.totals,
+            self.employee_counts.setdefault(row.get("authorId"), empty_pr_counts()),
+            self.repo_counts.setdefault(pr_repo_key(row), empty_pr_counts()),
+        ]
+        status = row.get("status") or "open"
+        ci = row.get("ci_overall")
+        for counts in buckets:
+            counts["total"] += sign
+            if status in ("open", "merged", "closed"):
+                counts[status] += sign
+            if ci in ("passing", "failing", "pending"):
+                counts[f"ci_{ci}"] += sign
+
+        head_key = (row.get("repo_owner"), row.get("repo_name"), row.get("head_sha"))
+        ids = self.by_head.setdefault(head_key, set())
+        if sign > 0:
+            ids.add(row["id"])
+        else:
+            ids.discard(row["id"])
+            if not ids:
+                del self.by_head[head_key]
+
+        order_key = (row.get("last_updated_at") or "", row["id"])
+        for key in self._listing_keys(row):
+            listing = self.ordered.setdefault(key, [])
+            if sign > 0:
+                bisect.insort(listing, order_key)
+                continue
+            i = bisect.bisect_left(listing, order_key)
+            if i < len(listing) and listing[i] == order_key:
+                del listing[i]
+            if not listing:
+                del self.ordered[key]
+
+    def upsert(self, row: dict):
+        if row.get("id") is None:
+            return
+        old = self.rows.get(row["id"])
+        if old is not None:
+            self._apply(old, -1)
+            row = {**old, **row}
+        self.rows[row["id"]] = row
+        self._apply(row, +1)
+
+    def update_by_head(self, repo_owner, repo_name, head_sha, changes: dict, only_open: bool = False):
+        for pr_id in list(self.by_head.get((repo_owner, repo_name, head_sha), ())):
+            if only_open and self.rows[pr_id].get("status") != "open":
+                continue
+            self.upsert({"id": pr_id, **changes})
+
+    def page(self, filters: list, limit: int, offset: int):
+        """(total, rows) newest first for rows matching every ("author"|"repo"|"status", value) filter."""
+        listings = [self.ordered.get(key, []) for key in filters] or [self.ordered.get(None, [])]
+        smallest = min(range(len(listings)), key=lambda i: len(listings[i]))
+        listing = listings[smallest]
+        others = [key for i, key in enumerate(filters) if i != smallest]
+
+        if not others:
+            end = max(len(listing) - offset, 0)
+            picked = listing[max(end - limit, 0):end][::-1]
+            return len(listing), [self.rows[pr_id] for _, pr_id in picked]
+
+        total, rows = 0, []
+        for _, pr_id in reversed(listing):
+            row = self.rows[pr_id]
+            if all(key in self._listing_keys(row) for key in others):
+                if offset <= total < offset + limit:
+                    rows.append(row)
+                total += 1
+        return total, rows
+
+
+class PRRollup:
+    """In-memory PR rows plus per-employee / per-repo counters.
+
+    Loaded once from the `PR` table and then kept current by the webhook
+    handlers, so reads never scan PR x ci_checks. Each worker holds its own
+    copy and reloads it in the background every PR_ROLLUP_RESYNC_SECONDS to
+    pick up changes delivered to other workers. A reload reads into a new
+    PRIndex without the lock and swaps it in; webhook updates made meanwhile
+    are replayed onto it first.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._load_lock = threading.Lock()
+        self.loaded_at: float | None = None
+        self.index = PRIndex()
+        self._pending: list | None = None
+
+    def upsert(self, row: dict):
+        with self._lock:
+            self.index.upsert(row)
+            if self._pending is not None:
+                self._pending.append(("upsert", (row,)))
+
+    def update_by_head(self, repo_owner, repo_name, head_sha, changes: dict, only_open: bool = False):
+        with self._lock:
+            self.index.update_by_head(repo_owner, repo_name, head_sha, changes, only_open)
+            if self._pending is not None:
+                self._pending.append(("update_by_head", (repo_owner, repo_name, head_sha, changes, only_open)))
+
+    def load(self):
+        """Rebuild from the PR table; callers hold _load_lock."""
+        with self._lock:
+            self._pending = []
+        try:
+            fresh = PRIndex()
+            for page in iter_table_pages(supabase_auth, "PR", PR_ROLLUP_COLUMNS):
+                for row in page:
+                    fresh.upsert(row)
+            with self._lock:
+                for method, args in self._pending:
+                    getattr(fresh, method)(*args)
+                self.index = fresh
+                self.loaded_at = time.monotonic()
+        finally:
+            with self._lock:
+                self._pending = None
+        logger.info("PR rollup loaded with %s PRs", len(fresh.rows))
+
+    def _background_load(self):
+        if not self._load_lock.acquire(blocking=False):
+            return
+        try:
+            self.load()
+        except Exception as e:
+            logger.error("💥 PR rollup reload failed: %s", e)
+        finally:
+            self._load_lock.release()
+
+    def ensure_loaded(self):
+        if self.loaded_at is None:
+            # the first readers wait for one load instead of each starting their own
+            with self._load_lock:
+                if self.loaded_at is None:
+                    self.load()
+        elif time.monotonic() - self.loaded_at > PR_ROLLUP_RESYNC_SECONDS and not self._load_lock.locked():
+            threading.Thread(target=self._background_load, name="pr-rollup-load", daemon=True).start()
+
+    def page(self, employee_id=None, repo=None, status=None, limit: int = 100, offset: int = 0):
+        filters = []
+        if employee_id is not None:
+            filters.append(("author", employee_id))
+        if repo:
+            filters.append(("repo", repo))
+        if status:
+            filters.append(("status", status))
+        with self._lock:
+            return self.index.page(filters, max(limit, 0), max(offset, 0))
+
+    @staticmethod
+    def summary_for(counts: dict) -> dict:
+        finished = counts["ci_passing"] + counts["ci_failing"]
+        return {**counts, "ci_pass_rate": round(counts["ci_passing"] / finished, 4) if finished else None}
+
+    def summary(self, employee_id=None, repo=None) -> dict:
+        with self._lock:
+            index = self.index
+            if employee_id is not None:
+                return self.summary_for(index.employee_counts.get(employee_id) or empty_pr_counts())
+            if repo:
+                return self.summary_for(index.repo_counts.get(repo) or empty_pr_counts())
+            return {
+                "totals": self.summary_for(index.totals),
+                "by_employee": {str(k): self.summary_for(v) for k, v in index.employee_counts.items()},
+                "by_repo": {k: self.summary_for(v) for k, v in index.repo_counts.items()},
+            }
+
+
+pr_rollup = PRRollup()
+
+
+@app.get("/prs")
+def get_prs(employee_id: int | None = None, repo: str | None = None, status: str | None = None, limit: int = 100, offset: int = 0):
+    """List PRs from the in-memory rollup (filters: employee_id, repo=owner/name, status)"""
+    try:
+        pr_rollup.ensure_loaded()
+        total, rows = pr_rollup.page(employee_id, repo, status, limit, offset)
+
+        list_logger.info("Returning %s of %s PRs.", len(rows), total)
+        return {"success": True, "total": total, "data": rows}
+
+    except Exception as e:
+        list_logger.error("💥 Fetch PRs Error: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/prs/summary")
+def get_pr_summary(employee_id: int | None = None, repo: str | None = None):
+    """Open/merged counts and CI pass rate, overall or for one employee / repo"""
+    try:
+        pr_rollup.ensure_loaded()
+        return {"success": True, "data": pr_rollup.summary(employee_id, repo)}
+
+    except Exception as e:
+        list_logger.error("💥 PR Summary Error: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# ============================
+# 📈 TEAM ANALYTICS
+# ============================
+# Columnar tasks / PR / ci_checks (see analytics.py). Loaded in pages, kept
+# current from the write paths below, fully reloaded every
+# ANALYTICS_RESYNC_SECONDS to pick up changes made through other workers.
+# Loads run on a background thread; /analytics serves the previous columns
+# until the new ones are swapped in.
+ANALYTICS_RESYNC_SECONDS = int(os.environ.get("ANALYTICS_RESYNC_SECONDS", "900"))
+team_analytics = TeamAnalytics()
+team_analytics_loaded_at: float | None = None
+team_analytics_load_lock = threading.Lock()
+
+
+def reload_team_analytics():
+    global team_analytics_loaded_at
+    if not team_analytics_load_lock.acquire(blocking=False):
+        return  # a load is already running
+    try:
+        started = time.perf_counter()
+        team_analytics.load_pages(
+            iter_table_pages(supabase_transcript, "tasks", "id, assigned_to, status, created_at"),
+            iter_table_pages(supabase_auth, "PR", "id, status, \"authorId\", \"createdAt\", last_updated_at, repo_owner, repo_name"),
+            iter_table_pages(supabase_auth, "ci_checks", "id, repo_owner, repo_name, status, conclusion"),
+        )
+        team_analytics_loaded_at = time.monotonic()
+        logger.info("Analytics loaded in %.2fs", time.perf_counter() - started)
+    except Exception as e:
+        logger.error("💥 Analytics load failed: %s", e)
+    finally:
+        team_analytics_load_lock.release()
+
+
+def ensure_analytics_loaded():
+    """Start a background load if the columns are missing or stale; never waits for it."""
+    if team_analytics_loaded_at is not None and time.monotonic() - team_analytics_loaded_at < ANALYTICS_RESYNC_SECONDS:
+        return
+    if not team_analytics_load_lock.locked():
+        threading.Thread(target=reload_team_analytics, name="analytics-load", daemon=True).start()
+
+
+@app.on_event("startup")
+def start_analytics_load():
+    ensure_analytics_loaded()
+
+
+def record_analytics(upsert, rows):
+    """Feed written rows to the analytics columns; never fails the write itself."""
+    try:
+        if rows:
+            upsert(rows)
+    except Exception as e:
+        logger.warning("Analytics update failed: %s", e)
+
+
+@app.get("/analytics")
+def get_analytics(user: dict = Depends(require_roles("ADMIN", "MANAGER"))):
+    """Tasks completed per assignee per week, PR cycle time and CI failure rate per repo"""
+    try:
+        ensure_analytics_loaded()
+        if team_analytics_loaded_at is None:
+            raise HTTPException(status_code=503, detail="Analytics are still loading, try again shortly")
+        return {
+            "success": True,
+            "data": team_analytics.summary(),
+            "age_seconds": round(time.monotonic() - team_analytics_loaded_at, 1),
+        }
+
+    except HTTPException as e:
+        logger.warning("⚠️ Analytics unavailable: %s", e.detail)
+        raise e
+    except Exception as e:
+        logger.error("💥 Analytics Error: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# ============================
+# 🐙 GitHub Webhook Handlers
+# ============================
+# (repo_owner, repo_name, head_sha) -> {"id": PR.id, "authorId": ...}
+# Lets check_run attach pr_id / authorid without a PR lookup per check.
+pr_by_head_sha = LRUCache(maxsize=4096)
+
+# A commit can have several check suites (one per GitHub App / workflow).
+# Each suite's result is upserted into ci_suites (db/ci_suites.sql) and
+# PR.ci_overall is recombined from all of the commit's rows, so every worker
+# (and a restarted one) sees the same set of suites.
+CI_SUITE_CONFLICT_COLUMNS = "repo_owner,repo_name,head_sha,suite_id"
+
+# check_suite / workflow_run conclusion -> PR.ci_overall
+CI_OVERALL_BY_CONCLUSION = {
+    "success": "passing",
+    "neutral": "passing",
+    "skipped": "passing",
+    "failure": "failing",
+    "timed_out": "failing",
+    "cancelled": "failing",
+    "action_required": "failing",
+    "startup_failure": "failing",
+    "stale": "failing",
+}
+
+
+def ci_overall_for(status: str | None, conclusion: str | None) -> str:
+    if status != "completed":
+        return "pending"
+    return CI_OVERALL_BY_CONCLUSION.get(conclusion or "", "pending")
+
+
+def combine_ci_overall(values) -> str:
+    values = list(values)
+    if "failing" in values:
+        return "failing"
+    if not values or "pending" in values:
+        return "pending"
+    return "passing"
+
+
+def commit_ci_overall(repo_owner, repo_name, head_sha) -> str | None:
+    """Combined result of every suite recorded for a commit, or None if none reported yet."""
+    res = supabase_auth.table("ci_suites").select("overall") \
+        .eq("repo_owner", repo_owner).eq("repo_name", repo_name).eq("head_sha", head_sha).execute()
+    rows = supabase_result_data(res) or []
+    if not rows:
+        return None
+    return combine_ci_overall(r.get("overall") for r in rows)
+
+
+def record_suite_result(repo_owner, repo_name, head_sha, suite_id, overall):
+    """Store one suite result, recombine the commit's suites and write PR.ci_overall if it changed."""
+    supabase_auth.table("ci_suites").upsert({
+        "repo_owner": repo_owner,
+        "repo_name": repo_name,
+        "head_sha": head_sha,
+        "suite_id": str(suite_id),
+        "overall": overall,
+        "updated_at": datetime.utcnow().isoformat()
+    }, on_conflict=CI_SUITE_CONFLICT_COLUMNS).execute()
+    aggregate = commit_ci_overall(repo_owner, repo_name, head_sha) or overall
+
+    # The filter makes an unchanged value a no-op; no PR yet matches 0 rows,
+    # and handle_pull_request seeds ci_overall from ci_suites when it arrives.
+    changes = {"ci_overall": aggregate, "last_updated_at": datetime.utcnow().isoformat()}
+    res = supabase_auth.table("PR").update(changes).eq("repo_owner", repo_owner).eq("repo_name", repo_name).eq("head_sha", head_sha) \
+        .or_(f"ci_overall.is.null,ci_overall.neq.{aggregate}").execute()
+    written = bool(supabase_result_data(res))
+    if written:
+        pr_rollup.update_by_head(repo_owner, repo_name, head_sha, changes)
+    return aggregate, written
+
+
+def lookup_pr_for_commit(repo_owner, repo_name, commit_sha):
+    """PR id / author for a commit, served from pr_by_head_sha when possible."""
+    key = (repo_owner, repo_name, commit_sha)
+    cached = pr_by_head_sha.get(key)
+    if cached is not None:
+        return cached
+
+    pr_lookup = supabase_auth.table("PR") \
+        .select("id, \"authorId\", repo_owner, repo_name, head_sha") \
+        .eq("head_sha", commit_sha) \
+        .execute()
+    pr_list = supabase_result_data(pr_lookup) or []
+    if isinstance(pr_list, dict):
+        pr_list = [pr_list]
+    if not pr_list:
+        return None
+
+    # prefer exact repo match
+    picked = None
+    for r in pr_list:
+        if r.get("repo_owner") == repo_owner and r.get("repo_name") == repo_name:
+            picked = r
+            break
+    picked = picked or pr_list[0]
+    found = {"id": picked.get("id"), "authorId": picked.get("authorId") or picked.get("authorid")}
+    pr_by_head_sha.set(key, found)
+    return found
+
+
+# -------------------- pull_request event --------------------
+def handle_pull_request(payload: dict):
+    pr = payload.get("pull_request") or {}
+    sender = payload.get("sender") or {}
+    repo_owner, repo_name = repo_coords(payload.get("repository") or {})
+
+    pr_number = pr.get("number")
+    head_sha = (pr.get("head") or {}).get("sha") or pr.get("head_sha")
+    pr_html_url = pr.get("html_url")
+    pr_state = pr.get("state")  # open/closed
+    merged = pr.get("merged", False)
+    body_text = pr.get("body") or ""
+    created_at = pr.get("created_at")
+    updated_at = pr.get("updated_at")
+
+    parsed_taskid, parsed_empgh = parse_prefilled_fields(body_text)
+    sender_login = (sender.get("login") if sender else None)
+    author_id = resolve_author_id(sender_login, parsed_empgh)
+
+    status = "merged" if merged else (pr_state or "open")
+
+    # Upsert PR row (lookup by repo_owner+repo_name+pr_number)
+    try:
+        existing = supabase_auth.table("PR").select("*")\
+            .eq("repo_owner", repo_owner).eq("repo_name", repo_name).eq("pr_number", pr_number).execute()
+        existing_data = supabase_result_data(existing)
+        if existing_data and isinstance(existing_data, list) and len(existing_data) > 0:
+            # update
+            row_id = existing_data[0].get("id")
+            update_payload = {
+                "url": pr_html_url,
+                "status": status,
+                "taskid_raw": parsed_taskid ,
+                "authorId": author_id,
+                "last_updated_at": updated_at or datetime.utcnow().isoformat(),
+                "head_sha": head_sha,
+                "pr_html_url": pr_html_url,
+                "repo_owner": repo_owner,
+                "repo_name": repo_name,
+                "pr_number": pr_number
+            }
+            if head_sha and head_sha != existing_data[0].get("head_sha"):
+                # suites may have reported for the new head before this event
+                suites_overall = commit_ci_overall(repo_owner, repo_name, head_sha)
+                if suites_overall:
+                    update_payload["ci_overall"] = suites_overall
+            supabase_auth.table("PR").update(update_payload).eq("id", row_id).execute()
+            pr_rollup.upsert({**existing_data[0], **update_payload})
+            record_analytics(team_analytics.upsert_prs, [{**existing_data[0], **update_payload}])
+            webhook_logger.info("Updated PR %s/%s#%s", repo_owner, repo_name, pr_number)
+        else:
+            # insert
+            insert_payload = {
+                "url": pr_html_url,
+                "status": status,
+                "taskid_raw": parsed_taskid,
+                "authorId": author_id,
+                "createdAt": created_at or datetime.utcnow().isoformat(),
+                # check suites can finish before the PR is opened
+                "ci_overall": commit_ci_overall(repo_owner, repo_name, head_sha) if head_sha else None,
+                "head_sha": head_sha,
+                "pr_html_url": pr_html_url,
+                "last_updated_at": updated_at or datetime.utcnow().isoformat(),
+                "repo_owner": repo_owner,
+                "repo_name": repo_name,
+                "pr_number": pr_number
+            }
+            res = supabase_auth.table("PR").insert(insert_payload).execute()
+            inserted = supabase_result_data(res) or []
+            row_id = inserted[0].get("id") if isinstance(inserted, list) and inserted else None
+            pr_rollup.upsert({**insert_payload, "id": row_id})
+            record_analytics(team_analytics.upsert_prs, supabase_result_data(res))
+            webhook_logger.info("Inserted PR %s/%s#%s", repo_owner, repo_name, pr_number)
+        if head_sha and row_id is not None:
+            pr_by_head_sha.set((repo_owner, repo_name, head_sha), {"id": row_id, "authorId": author_id})
+    except Exception as e:
+        webhook_logger.error("DB upsert PR failed: %s", e)
+
+    return {"ok": True, "msg": "pull_request processed"}
+
+
+# -------------------- check_run event --------------------
+def handle_check_run(payload: dict):
+    """Record one check in ci_checks. PR.ci_overall is left to check_suite / workflow_run."""
+    check = payload.get("check_run") or {}
+    repo_owner, repo_name = repo_coords(payload.get("repository") or {})
+    commit_sha = check.get("head_sha") or check.get("head_commit", {}).get("id")
+    check_name = check.get("name")
+    status = check.get("status")
+    conclusion = check.get("conclusion")
+    details_url = check.get("html_url") or check.get("details_url")
+    started_at = check.get("started_at")
+    completed_at = check.get("completed_at")
+
+    webhook_logger.info("check_run: repo_owner=%s, repo_name=%s, commit_sha=%s, check_name=%s, status=%s, conclusion=%s", repo_owner, repo_name, commit_sha, check_name, status, conclusion)
+
+    if not commit_sha:
+        webhook_logger.warning("check_run received with no commit sha")
+        return {"ok": False, "msg": "no commit sha"}
+
+    # Try to find matching PR to attach pr_id / authorid
+    pr_id_for_check = None
+    authorid_for_check = None
+    try:
+        matched = lookup_pr_for_commit(repo_owner, repo_name, commit_sha)
+        if matched:
+            pr_id_for_check = matched.get("id")
+            authorid_for_check = matched.get("authorId")
+    except Exception as e:
+        webhook_logger.warning("PR lookup failed for check_run: %s", e)
+
+    # Build payload for ci_checks
+    payload_ci = {
+        "repo_owner": repo_owner,
+        "repo_name": repo_name,
+        "commit_sha": commit_sha,
+        "check_name": check_name,
+        "status": status,
+        "conclusion": conclusion,
+        "details_url": details_url,
+        "started_at": started_at,
+        "completed_at": completed_at,
+        "authorid": authorid_for_check,
+        "pr_id": pr_id_for_check
+    }
+
+    try:
+        # Try update if an existing check exists, otherwise insert.
+        existing_ck = supabase_auth.table("ci_checks").select("id") \
+            .eq("repo_owner", repo_owner).eq("repo_name", repo_name).eq("commit_sha", commit_sha).eq("check_name", check_name).execute()
+        existing_ck_data = supabase_result_data(existing_ck)
+        if existing_ck_data and isinstance(existing_ck_data, list) and len(existing_ck_data) > 0:
+            ck_id = existing_ck_data[0].get("id")
+            supabase_auth.table("ci_checks").update(payload_ci).eq("id", ck_id).execute()
+            record_analytics(team_analytics.upsert_ci_checks, [{**payload_ci, "id": ck_id}])
+        else:
+            res_ins = supabase_auth.table("ci_checks").insert(payload_ci).execute()
+            record_analytics(team_analytics.upsert_ci_checks, supabase_result_data(res_ins))
+    except Exception as e:
+        webhook_logger.error("ci_checks upsert failed (exception): %s", e)
+        return {"ok": False, "msg": f"ci_checks upsert failed: {e}"}
+
+    return {"ok": True, "msg": "check_run processed"}
+
+
+# -------------------- check_suite event --------------------
+def handle_check_suite(payload: dict):
+    suite = payload.get("check_suite") or {}
+    repo_owner, repo_name = repo_coords(payload.get("repository") or {})
+    head_sha = suite.get("head_sha")
+    if not head_sha:
+        webhook_logger.warning("check_suite received with no head sha")
+        return {"ok": False, "msg": "no head sha"}
+
+    overall = ci_overall_for(suite.get("status"), suite.get("conclusion"))
+    try:
+        aggregate, written = record_suite_result(repo_owner, repo_name, head_sha, suite.get("id"), overall)
+    except Exception as e:
+        webhook_logger.error("Failed to update ci_overall from check_suite: %s", e)
+        return {"ok": False, "msg": f"ci_overall update failed: {e}"}
+
+    webhook_logger.info("check_suite: %s/%s@%s suite=%s -> %s (written=%s)", repo_owner, repo_name, head_sha, suite.get('id'), aggregate, written)
+    return {"ok": True, "msg": "check_suite processed", "ci_overall": aggregate}
+
+
+# -------------------- workflow_run event --------------------
+def handle_workflow_run(payload: dict):
+    run = payload.get("workflow_run") or {}
+    repo_owner, repo_name = repo_coords(payload.get("repository") or {})
+    head_sha = run.get("head_sha")
+    if not head_sha:
+        webhook_logger.warning("workflow_run received with no head sha")
+        return {"ok": False, "msg": "no head sha"}
+
+    # A workflow run belongs to a check suite; key by it so the matching
+    # check_suite delivery for the same run is not counted twice.
+    suite_id = run.get("check_suite_id") or f"workflow_run:{run.get('id')}"
+    overall = ci_overall_for(run.get("status"), run.get("conclusion"))
+    try:
+        aggregate, written = record_suite_result(repo_owner, repo_name, head_sha, suite_id, overall)
+    except Exception as e:
+        webhook_logger.error("Failed to update ci_overall from workflow_run: %s", e)
+        return {"ok": False, "msg": f"ci_overall update failed: {e}"}
+
+    webhook_logger.info("workflow_run: %s/%s@%s %s -> %s (written=%s)", repo_owner, repo_name, head_sha, run.get('name'), aggregate, written)
+    return {"ok": True, "msg": "workflow_run processed", "ci_overall": aggregate}
+
+
+# -------------------- push event --------------------
+ZERO_SHA = "0" * 40
+
+def handle_push(payload: dict):
+    """Move open PRs from the old branch tip to the pushed commit and reset their CI to the new commit's."""
+    repo_owner, repo_name = repo_coords(payload.get("repository") or {})
+    before = payload.get("before")
+    after = payload.get("after")
+    if not before or not after or before == ZERO_SHA or after == ZERO_SHA or payload.get("deleted"):
+        return {"ok": True, "msg": "push ignored (branch created or deleted)"}
+
+    try:
+        # suites may have reported for the pushed commit before this event
+        changes = {
+            "head_sha": after,
+            "ci_overall": commit_ci_overall(repo_owner, repo_name, after) or "pending",
+            "last_updated_at": datetime.utcnow().isoformat()
+        }
+        supabase_auth.table("PR").update(changes).eq("repo_owner", repo_owner).eq("repo_name", repo_name).eq("head_sha", before).eq("status", "open").execute()
+    except Exception as e:
+        webhook_logger.error("Failed to refresh head_sha on push: %s", e)
+        return {"ok": False, "msg": f"head_sha refresh failed: {e}"}
+
+    pr_rollup.update_by_head(repo_owner, repo_name, before, changes, only_open=True)
+
+    old_key = (repo_owner, repo_name, before)
+    cached = pr_by_head_sha.pop(old_key)
+    if cached is not None:
+        pr_by_head_sha.set((repo_owner, repo_name, after), cached)
+
+    return {"ok": True, "msg": "push processed"}
+
+
+GITHUB_EVENT_HANDLERS = {
+    "pull_request": handle_pull_request,
+    "check_run": handle_check_run,
+    "check_suite": handle_check_suite,
+    "workflow_run": handle_workflow_run,
+    "push": handle_push,
+}
+
+
 @app.post("/webhooks/github")
 async def github_webhook(
     request: Request,
@@ -390,8 +2507,6 @@ async def github_webhook(
     x_github_event: str | None = Header(None),
     x_github_delivery: str | None = Header(None),
 ):
-    
-    print("Received signature:", x_hub_signature_256)
 
     # 1) raw body for signature check
     raw = await request.body()
@@ -399,357 +2514,43 @@ async def github_webhook(
     # 2) ensure secret present
     secret = os.environ.get("GITHUB_WEBHOOK_SECRET")
     if not secret:
-        logger.error("GITHUB_WEBHOOK_SECRET not set")
+        webhook_logger.error("GITHUB_WEBHOOK_SECRET not set")
         raise HTTPException(status_code=500, detail="Webhook secret not configured on server")
 
     if not verify_github_signature(raw, x_hub_signature_256 or "", secret):
-        logger.warning("GitHub webhook signature mismatch")
+        webhook_logger.warning("GitHub webhook signature mismatch")
         raise HTTPException(status_code=401, detail="Invalid signature")
 
+    event = (x_github_event or "").strip()
+    handler = GITHUB_EVENT_HANDLERS.get(event)
+    save_events = os.environ.get("ENABLE_SAVE_WEBHOOK_EVENTS", "false").lower() == "true"
+
+    # Acknowledge events we don't handle without parsing the body
+    if handler is None and not save_events:
+        return {"ok": True, "msg": f"ignored {event}"}
+
     # 3) parse JSON payload
     try:
         payload = json.loads(raw.decode("utf-8"))
     except Exception as e:
-        logger.error("Invalid JSON payload: %s", e)
+        webhook_logger.error("Invalid JSON payload: %s", e)
         raise HTTPException(status_code=400, detail="Invalid JSON")
 
-    event = (x_github_event or "").strip()
-
     # Optional: save raw event for debugging if env var enabled
     try:
-        if os.environ.get("ENABLE_SAVE_WEBHOOK_EVENTS", "false").lower() == "true":
-            supabase_auth.table("webhook_events").insert({
+        if save_events:
+            await run_in_threadpool(supabase_auth.table("webhook_events").insert({
                 "delivery_id": x_github_delivery,
                 "event_type": event,
                 "payload": payload,
                 "created_at": datetime.utcnow().isoformat()
-            }).execute()
+            }).execute)
     except Exception as e:
-        logger.warning("Failed saving webhook event: %s", e)
+        webhook_logger.warning("Failed saving webhook event: %s", e)
 
-    # helper to resolve employee id by github login or fallback to parsed emp gh
-    def resolve_author_id(sender_login: str | None, emp_gh_fallback: str | None):
-        try:
-            if sender_login:
-                res = supabase_auth.table("employee").select("id").eq("github_login", sender_login).execute()
-                data = supabase_result_data(res)
-                if data:
-                    # data is usually a list
-                    if isinstance(data, list) and len(data) > 0:
-                        return data[0].get("id")
-                    if isinstance(data, dict):
-                        return data.get("id")
-            if emp_gh_fallback:
-                res2 = supabase_auth.table("employee").select("id").eq("github_login", emp_gh_fallback).execute()
-                d2 = supabase_result_data(res2)
-                if d2:
-                    if isinstance(d2, list) and len(d2) > 0:
-                        return d2[0].get("id")
-                    if isinstance(d2, dict):
-                        return d2.get("id")
-        except Exception as e:
-            logger.warning("Error resolving employee: %s", e)
-        return None
+    if handler is None:
+        webhook_logger.info("Ignored GitHub event: %s", event)
+        return {"ok": True, "msg": f"ignored {event}"}
 
-    # -------------------- PULL_REQUEST event --------------------
-    if event == "pull_request":
-        pr = payload.get("pull_request") or {}
-        sender = payload.get("sender") or {}
-        repo = payload.get("repository") or {}
-
-        repo_owner = (repo.get("owner") or {}).get("login") or (repo.get("full_name") or "").split("/")[0]
-        repo_name = repo.get("name") or (repo.get("full_name") or "").split("/")[1] if repo.get("full_name") and "/" in repo.get("full_name") else repo.get("name")
-        pr_number = pr.get("number")
-        head_sha = (pr.get("head") or {}).get("sha") or pr.get("head_sha")
-        pr_html_url = pr.get("html_url")
-        pr_state = pr.get("state")  # open/closed
-        merged = pr.get("merged", False)
-        body_text = pr.get("body") or ""
-        created_at = pr.get("created_at")
-        updated_at = pr.get("updated_at")
-
-        parsed_taskid, parsed_empgh = parse_prefilled_fields(body_text)
-        sender_login = (sender.get("login") if sender else None)
-        author_id = resolve_author_id(sender_login, parsed_empgh)
-
-        status = "merged" if merged else (pr_state or "open")
-
-        # Upsert PR row (lookup by repo_owner+repo_name+pr_number)
-        try:
-            existing = supabase_auth.table("PR").select("*")\
-                .eq("repo_owner", repo_owner).eq("repo_name", repo_name).eq("pr_number", pr_number).execute()
-            existing_data = supabase_result_data(existing)
-            if existing_data and isinstance(existing_data, list) and len(existing_data) > 0:
-                # update
-                row_id = existing_data[0].get("id")
-                update_payload = {
-                    "url": pr_html_url,
-                    "status": status,
-                    "taskid_raw": parsed_taskid ,
-                    "authorId": author_id,
-                    "last_updated_at": updated_at or datetime.utcnow().isoformat(),
-                    "head_sha": head_sha,
-                    "pr_html_url": pr_html_url,
-                    "repo_owner": repo_owner,
-                    "repo_name": repo_name,
-                    "pr_number": pr_number
-                }
-                supabase_auth.table("PR").update(update_payload).eq("id", row_id).execute()
-                logger.info(f"Updated PR {repo_owner}/{repo_name}#{pr_number}")
-            else:
-                # insert
-                insert_payload = {
-                    "url": pr_html_url,
-                    "status": status,
-                    "taskid_raw": parsed_taskid,
-                    "authorId": author_id,
-                    "createdAt": created_at or datetime.utcnow().isoformat(),
-                    "ci_overall": None,
-                    "head_sha": head_sha,
-                    "pr_html_url": pr_html_url,
-                    "last_updated_at": updated_at or datetime.utcnow().isoformat(),
-                    "repo_owner": repo_owner,
-                    "repo_name": repo_name,
-                    "pr_number": pr_number
-                }
-                supabase_auth.table("PR").insert(insert_payload).execute()
-                logger.info(f"Inserted PR {repo_owner}/{repo_name}#{pr_number}")
-        except Exception as e:
-            logger.error("DB upsert PR failed: %s", e)
-
-        return {"ok": True, "msg": "pull_request processed"}
-
-    # -------------------- check_run event --------------------
-        # -------------------- check_run event (instrumented) --------------------
-    if event == "check_run":
-        # raw debug log
-        logger.info("Received check_run event")
-
-        check = payload.get("check_run") or {}
-        repo = payload.get("repository") or {}
-        repo_owner = (repo.get("owner") or {}).get("login") or (repo.get("full_name") or "").split("/")[0]
-        repo_name = repo.get("name") or (repo.get("full_name") or "").split("/")[1] if repo.get("full_name") and "/" in repo.get("full_name") else repo.get("name")
-        commit_sha = check.get("head_sha") or check.get("head_commit", {}).get("id")
-        check_name = check.get("name")
-        status = check.get("status")
-        conclusion = check.get("conclusion")
-        details_url = check.get("html_url") or check.get("details_url")
-        started_at = check.get("started_at")
-        completed_at = check.get("completed_at")
-
-        logger.info(f"check_run: repo_owner={repo_owner}, repo_name={repo_name}, commit_sha={commit_sha}, check_name={check_name}, status={status}, conclusion={conclusion}")
-
-        if not commit_sha:
-            logger.warning("check_run received with no commit sha")
-            return {"ok": False, "msg": "no commit sha"}
-
-        # Try to find matching PR to attach pr_id / authorid
-        pr_id_for_check = None
-        authorid_for_check = None
-        try:
-            pr_lookup = supabase_auth.table("PR") \
-                .select("id, \"authorId\", repo_owner, repo_name, head_sha") \
-                .eq("head_sha", commit_sha) \
-                .execute()
-            pr_list = supabase_result_data(pr_lookup) or []
-            logger.info(f"PR lookup returned {len(pr_list) if isinstance(pr_list, list) else (1 if pr_list else 0)} rows")
-            if isinstance(pr_list, list) and len(pr_list) > 0:
-                # prefer exact repo match
-                picked = None
-                for r in pr_list:
-                    if r.get("repo_owner") == repo_owner and r.get("repo_name") == repo_name:
-                        picked = r
-                        break
-                picked = picked or pr_list[0]
-                pr_id_for_check = picked.get("id")
-                authorid_for_check = picked.get("authorId") or picked.get("authorid")
-                logger.info(f"Matched PR id={pr_id_for_check}, authorid={authorid_for_check}")
-            elif isinstance(pr_list, dict) and pr_list:
-                pr_id_for_check = pr_list.get("id")
-                authorid_for_check = pr_list.get("authorId") or pr_list.get("authorid")
-                logger.info(f"Matched single PR id={pr_id_for_check}, authorid={authorid_for_check}")
-        except Exception as e:
-            logger.warning("PR lookup failed for check_run: %s", e)
-
-        # Build payload for ci_checks
-        payload_ci = {
-            "repo_owner": repo_owner,
-            "repo_name": repo_name,
-            "commit_sha": commit_sha,
-            "check_name": check_name,
-            "status": status,
-            "conclusion": conclusion,
-            "details_url": details_url,
-            "started_at": started_at,
-            "completed_at": completed_at,
-            "authorid": authorid_for_check,
-            "pr_id": pr_id_for_check
-        }
-
-        # For debugging: add a debug flag column if you want (optional)
-        try:
-            # Try update if an existing check exists, otherwise insert.
-            existing_ck = supabase_auth.table("ci_checks").select("*") \
-                .eq("repo_owner", repo_owner).eq("repo_name", repo_name).eq("commit_sha", commit_sha).eq("check_name", check_name).execute()
-            existing_ck_data = supabase_result_data(existing_ck)
-            if existing_ck_data and isinstance(existing_ck_data, list) and len(existing_ck_data) > 0:
-                ck_id = existing_ck_data[0].get("id")
-                logger.info(f"Existing ci_checks found id={ck_id}; updating.")
-                res_upd = supabase_auth.table("ci_checks").update(payload_ci).eq("id", ck_id).execute()
-                logger.info(f"Supabase update result: {getattr(res_upd, 'status_code', 'no-status')} / error={getattr(res_upd, 'error', None)}")
-            else:
-                logger.info("No existing ci_checks found; inserting new row.")
-                res_ins = supabase_auth.table("ci_checks").insert(payload_ci).execute()
-                logger.info(f"Supabase insert result: {getattr(res_ins, 'status_code', 'no-status')} / error={getattr(res_ins, 'error', None)}")
-        except Exception as e:
-            logger.error("ci_checks upsert failed (exception): %s", e)
-            # As last resort: log the payload to a debug table (if exists) or to file — here we just return error
-            return {"ok": False, "msg": f"ci_checks upsert failed: {e}"}
-
-        # recompute PR.ci_overall (unchanged)
-        try:
-            prs_res = supabase_auth.table("PR").select("*").eq("head_sha", commit_sha).execute()
-            prs_list = supabase_result_data(prs_res) or []
-            for pr in prs_list:
-                checks_res = supabase_auth.table("ci_checks").select("*") \
-                    .eq("repo_owner", pr.get("repo_owner")).eq("repo_name", pr.get("repo_name")).eq("commit_sha", commit_sha).execute()
-                checks_list = supabase_result_data(checks_res) or []
-
-                overall = "pending"
-                if any((c.get("conclusion") == "failure") for c in checks_list):
-                    overall = "failing"
-                elif any((c.get("status") in ("queued", "in_progress", None)) for c in checks_list):
-                    overall = "pending"
-                elif checks_list and all((c.get("conclusion") == "success") for c in checks_list):
-                    overall = "passing"
-                else:
-                    overall = "pending"
-
-                supabase_auth.table("PR").update({
-                    "ci_overall": overall,
-                    "last_updated_at": datetime.utcnow().isoformat()
-                }).eq("id", pr.get("id")).execute()
-        except Exception as e:
-            logger.error("Failed to recompute ci_overall: %s", e)
-
-        return {"ok": True, "msg": "check_run processed (instrumented)"}
-
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    
-    # if event == "check_run":
-    #     check = payload.get("check_run") or {}
-    #     repo = payload.get("repository") or {}
-    #     repo_owner = (repo.get("owner") or {}).get("login") or (repo.get("full_name") or "").split("/")[0]
-    #     repo_name = repo.get("name") or (repo.get("full_name") or "").split("/")[1] if repo.get("full_name") and "/" in repo.get("full_name") else repo.get("name")
-    #     commit_sha = check.get("head_sha") or check.get("head_commit", {}).get("id")
-    #     check_name = check.get("name")
-    #     status = check.get("status")  # queued/in_progress/completed
-    #     conclusion = check.get("conclusion")  # success/failure/neutral/etc
-    #     details_url = check.get("html_url") or check.get("details_url")
-    #     started_at = check.get("started_at")
-    #     completed_at = check.get("completed_at")
-
-    #     if not commit_sha:
-    #         logger.warning("check_run received with no commit sha")
-    #         return {"ok": False, "msg": "no commit sha"}
-
-    #     # --- Locate PR(s) that match this commit (prefer exact repo match)
-    #     pr_id_for_check = None
-    #     authorid_for_check = None
-    #     try:
-    #         pr_lookup = supabase_auth.table("PR") \
-    #             .select("id, \"authorId\", repo_owner, repo_name") \
-    #             .eq("head_sha", commit_sha) \
-    #             .execute()
-    #         pr_list = supabase_result_data(pr_lookup) or []
-    #         # prefer matching repo_owner/repo_name if there are multiple matches
-    #         if isinstance(pr_list, list) and len(pr_list) > 0:
-    #             # try to find exact repo match first
-    #             exact = None
-    #             for r in pr_list:
-    #                 if (not repo_owner or not repo_name) or (r.get("repo_owner") == repo_owner and r.get("repo_name") == repo_name):
-    #                     exact = r
-    #                     break
-    #             picked = exact or pr_list[0]
-    #             pr_id_for_check = picked.get("id")
-    #             # note: PR column stored authorId with camel-case in PR; we will map to ci_checks.authorid
-    #             authorid_for_check = picked.get("authorId") or picked.get("authorid") or None
-    #         elif isinstance(pr_list, dict) and pr_list:
-    #             pr_id_for_check = pr_list.get("id")
-    #             authorid_for_check = pr_list.get("authorId") or pr_list.get("authorid") or None
-    #     except Exception as e:
-    #         logger.warning("PR lookup failed for check_run: %s", e)
-
-    #     try:
-    #         # upsert into ci_checks (unique = repo_owner, repo_name, commit_sha, check_name)
-    #         existing_ck = supabase_auth.table("ci_checks").select("*")\
-    #             .eq("repo_owner", repo_owner).eq("repo_name", repo_name).eq("commit_sha", commit_sha).eq("check_name", check_name).execute()
-    #         existing_ck_data = supabase_result_data(existing_ck)
-
-
-
-    #         payload = {
-    #             "repo_owner": repo_owner,
-    #             "repo_name": repo_name,
-    #             "commit_sha": commit_sha,
-    #             "check_name": check_name,
-    #             "status": status,
-    #             "conclusion": conclusion,
-    #             "details_url": details_url,
-    #             "started_at": started_at,
-    #             "completed_at": completed_at,
-    #             "authorid": authorid_for_check,   # matches your ci_checks column name
-    #             "pr_id": pr_id_for_check
-    #         }
-
-    #         if existing_ck_data and isinstance(existing_ck_data, list) and len(existing_ck_data) > 0:
-    #             # update existing row
-    #             supabase_auth.table("ci_checks").update(payload).eq("id", existing_ck_data[0].get("id")).execute()
-    #         else:
-    #             supabase_auth.table("ci_checks").insert(payload).execute()
-
-
-    #     except Exception as e:
-    #         logger.error("ci_checks upsert failed: %s", e)
-
-    #     # recompute aggregate CI status for PRs matching this head sha
-    #     try:
-    #         prs_res = supabase_auth.table("PR").select("*").eq("head_sha", commit_sha).execute()
-    #         prs_list = supabase_result_data(prs_res) or []
-    #         for pr in prs_list:
-    #             checks_res = supabase_auth.table("ci_checks").select("*")\
-    #                 .eq("repo_owner", pr.get("repo_owner")).eq("repo_name", pr.get("repo_name")).eq("commit_sha", commit_sha).execute()
-    #             checks_list = supabase_result_data(checks_res) or []
-
-    #             overall = "pending"
-    #             if any((c.get("conclusion") == "failure") for c in checks_list):
-    #                 overall = "failing"
-    #             elif any((c.get("status") in ("queued", "in_progress", None)) for c in checks_list):
-    #                 overall = "pending"
-    #             elif checks_list and all((c.get("conclusion") == "success") for c in checks_list):
-    #                 overall = "passing"
-    #             else:
-    #                 overall = "pending"
-
-    #             supabase_auth.table("PR").update({
-    #                 "ci_overall": overall,
-    #                 "last_updated_at": datetime.utcnow().isoformat()
-    #             }).eq("id", pr.get("id")).execute()
-    #     except Exception as e:
-    #         logger.error("Failed to recompute ci_overall: %s", e)
-
-    #     return {"ok": True, "msg": "check_run processed"}
-
-    # logger.info(f"Ignored GitHub event: {event}")
-    # return {"ok": True, "msg": f"ignored {event}"}       
-
-
-    
+    # handlers make blocking supabase calls (with retry sleeps); keep them off the event loop
+    return await run_in_threadpool(handler, payload)